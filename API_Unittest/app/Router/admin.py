@@ -0,0 +1,15 @@
+from fastapi import APIRouter, HTTPException
+from app.db import db_chooser
+
+router = APIRouter()
+
+
+@router.get("/db/{db_name}/pragmas")
+def read_pragmas(db_name: str, readonly: bool = False):
+    if db_name not in db_chooser.db_names:
+        raise HTTPException(status_code=404, detail="Database not found")
+    return db_chooser.read_pragmas(db_name, readonly)
+
+@router.get("/db/pragmas")
+def read_all_pragmas(readonly: bool = False):
+    return {name: db_chooser.read_pragmas(name, readonly) for name in db_chooser.db_names}
@@ -0,0 +1,169 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import db
+from app import model, schemas
+from app.pagination import KeysetPage
+from app.ratelimit import auth_limiter
+from app.users import PREFIX_SEARCH_MAX, prefix_filter
+from app.roles import role_cache
+from app.user_import import IMPORT_MAX_BYTES, IMPORT_MAX_ROWS, UserImport, body_batches
+from app.dependencies import get_current_user, require_role, api_key_cache, hash_api_key, new_api_key, API_KEY_PREFIX_LENGTH, create_access_token, ACCESS_TOKEN_EXPIRATION
+from app.hashing import hasher
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+
+router = APIRouter()
+
+
+async def register(user: schemas.CreateUser, role_name: str, db: AsyncSession):
+    db_user = (await db.execute(select(model.User).where(model.User.username_lower == user.username.lower()))).scalars().first()
+    if db_user:
+        raise HTTPException(status_code=400, detail="Username exists")
+
+    # bcrypt is CPU bound, it runs in the hashing process pool
+    hashed_pwd = await hasher.hash_async(user.passwd)
+    db_user = model.User(
+        username=user.username,
+        firstname=user.firstname,
+        lastname=user.lastname,
+        hashed_pwd=hashed_pwd
+    )
+    db.add(db_user)
+    try:
+        await db.flush()
+    except IntegrityError:
+        # The unique username_lower index caught a registration that raced the check above
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Username exists")
+    # The role id comes from the cache, so this is a single insert and not a roles lookup
+    role_id = await role_cache.role_id_async(db, role_name)
+    await db.execute(insert(model.user_roles).values(user_id=db_user.id, role_id=role_id))
+    # expire_on_commit is off for async sessions, db_user stays readable afterwards
+    await db.commit()
+
+    return db_user
+
+
+@router.post("/register_user", response_model=schemas.User)
+async def reg(request: Request, user: schemas.CreateUser, db: AsyncSession = Depends(db.get_async_db("auth"))):
+    # Throttled before the username lookup and the bcrypt hash
+    await auth_limiter.check_async(request, user.username)
+    return await register(user, "user", db)
+
+@router.post("/register_admin", response_model=schemas.User)
+async def reg_admin(request: Request, user: schemas.CreateUser, db: AsyncSession = Depends(db.get_async_db("auth"))):
+    # Throttled before the username lookup and the bcrypt hash
+    await auth_limiter.check_async(request, user.username)
+    return await register(user, "admin", db)
+
+
+@router.post("/login", response_model=schemas.Token)
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(db.get_async_db("auth"))):
+    # Throttled before the password check
+    await auth_limiter.check_async(request, form_data.username)
+    user = await authenticate_user(db, form_data.username, form_data.password)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRATION)
+    access_token = create_access_token(
+        data={"sub": user.username}, expires=access_token_expires
+    )
+    return {"access_token": access_token, "token_type": "bearer"}
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = (await db.execute(select(model.User).where(model.User.username == username))).scalars().first()
+    if not user or not await hasher.verify_async(password, user.hashed_pwd):
+        return False
+    return user
+
+@router.get("/me", response_model=schemas.CurrentUser)
+async def read_me(user: schemas.CurrentUser = Depends(get_current_user)):
+    return user
+
+# API keys for machine clients, managed with a bearer token so a leaked key can't mint more
+@router.post("/api-keys", response_model=schemas.ApiKeyCreated)
+async def create_api_key(body: schemas.ApiKeyCreate, user: schemas.CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(db.get_async_db("auth"))):
+    key = new_api_key()
+    api_key = model.ApiKey(user_id=user.id, name=body.name, prefix=key[:API_KEY_PREFIX_LENGTH], key_hash=hash_api_key(key))
+    db.add(api_key)
+    await db.commit()
+    await db.refresh(api_key)
+    # The only time the key is shown, just its hash is stored
+    api_key.key = key
+    return api_key
+
+@router.get("/api-keys", response_model=List[schemas.ApiKey])
+async def read_api_keys(user: schemas.CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(db.get_async_db("auth", readonly=True))):
+    result = await db.execute(select(model.ApiKey).where(model.ApiKey.user_id == user.id).order_by(model.ApiKey.id))
+    return result.scalars().all()
+
+@router.delete("/api-keys/{key_id}", response_model=schemas.ApiKey)
+async def revoke_api_key(key_id: int, user: schemas.CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(db.get_async_db("auth"))):
+    api_key = (await db.execute(
+        select(model.ApiKey).where(model.ApiKey.id == key_id, model.ApiKey.user_id == user.id)
+    )).scalars().first()
+    if api_key is None:
+        raise HTTPException(status_code=404, detail="API key not found")
+    if api_key.revoked_at is None:
+        api_key.revoked_at = datetime.utcnow()
+        await db.commit()
+    # Other workers let it through until their cached entry expires
+    api_key_cache.pop(api_key.key_hash)
+    return api_key
+
+# get user by id
+@router.get("/users_i/{user_id}", response_model=schemas.User)
+async def read_user_by_id(user_id: int, db: AsyncSession = Depends(db.get_async_db("auth", readonly=True))):
+    db_user = await db.get(model.User, user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return db_user
+
+# get user by user_name, in any case
+@router.get("/users_n/{user_name}", response_model=schemas.User)
+async def read_user_by_name(user_name: str, db: AsyncSession = Depends(db.get_async_db("auth", readonly=True))):
+    db_user = (await db.execute(select(model.User).where(model.User.username_lower == user_name.lower()))).scalars().first()
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return db_user
+
+# Usernames starting with prefix in any case, for the user picker's autocomplete
+@router.get("/users/search", response_model=List[schemas.User])
+async def search_users(prefix: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=PREFIX_SEARCH_MAX), db: AsyncSession = Depends(db.get_async_db("auth", readonly=True))):
+    result = await db.execute(
+        select(model.User)
+        .where(prefix_filter(model.User.username_lower, prefix.lower()))
+        .order_by(model.User.username_lower)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+# get all user
+@router.get("/users", response_model=List[schemas.User])
+async def read_user(request: Request, response: Response, db: AsyncSession = Depends(db.get_async_db("auth", readonly=True)), skip: int = 0, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None):
+    page = KeysetPage(model.User, sort, cursor, limit, skip, sort_columns=("id", "username"))
+    result = await db.execute(page.apply(select(model.User).where(model.User.username)))
+    return page.finish(result.scalars().all(), request, response)
+
+# Create users in bulk from a CSV or NDJSON body, one record per line
+@router.post("/users/import", response_model=schemas.ImportReport)
+async def import_users(request: Request, format: str = "ndjson", role: str = "user", admin: schemas.CurrentUser = Depends(require_role("admin"))):
+    importer = UserImport(format, role, max_rows=IMPORT_MAX_ROWS)
+    try:
+        # Each batch hashes and commits in a worker thread while the body streams in
+        async for lines in body_batches(request.stream(), max_bytes=IMPORT_MAX_BYTES):
+            await run_in_threadpool(importer.feed, lines)
+    except HTTPException as e:
+        # The batches before the error are in, so say how far it got
+        return JSONResponse(importer.report(aborted=e.detail), status_code=e.status_code, headers=e.headers)
+    return importer.report()
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import model, schemas
+from app.fields import Fieldset
+from app.pagination import KeysetPage
+from typing import Optional
+from app import db
+
+router = APIRouter()
+
+@router.post("/category", response_model=schemas.Category)
+async def create_category(section: schemas.CategoryBase, db: AsyncSession = Depends(db.get_async_db("shop"))):
+    db_cat = model.Category(**section.dict())
+    db.add(db_cat)
+    await db.commit()
+    await db.refresh(db_cat)
+    return db_cat
+
+@router.get("/cat_list/", response_model=list[schemas.Category])
+async def read_cat_list(request: Request, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None, fields: Optional[str] = None, db: AsyncSession = Depends(db.get_async_db("shop", readonly=True))):
+    page = KeysetPage(model.Category, sort, cursor, limit, skip, sort_columns=("id", "name"))
+    fieldset = Fieldset(model.Category, schemas.Category, fields)
+    result = await db.execute(page.apply(select(model.Category).options(*fieldset.options(*page.columns))))
+    return fieldset.render(page.finish(result.scalars().all(), request, response), response)
+
+@router.get("/category/{id}/", response_model=schemas.Category)
+async def read_cat(id: int, db: AsyncSession = Depends(db.get_async_db("shop", readonly=True))):
+    db_cat = await db.get(model.Category, id)
+    if db_cat is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+    return db_cat
+
+@router.put("/category/{id}", response_model=schemas.Category)
+async def update_cat(id: int, section: schemas.CategoryBase, db: AsyncSession = Depends(db.get_async_db("shop"))):
+    db_cat = await db.get(model.Category, id)
+    if db_cat is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+
+    for key, value in section.dict().items():
+        setattr(db_cat, key, value)
+
+    await db.commit()
+    return db_cat
+
+@router.delete("/category/{id}", response_model=schemas.Category)
+async def delete_cat(id: int, db: AsyncSession = Depends(db.get_async_db("shop"))):
+    db_cat = await db.get(model.Category, id)
+    if db_cat is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+
+    await db.delete(db_cat)
+    await db.commit()
+    return db_cat
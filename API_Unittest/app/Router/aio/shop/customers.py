@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import model, schemas
+from app.fields import Fieldset
+from app.pagination import KeysetPage
+from typing import Optional
+from app import db
+
+router = APIRouter()
+
+@router.post("/customer", response_model=schemas.Customer)
+async def create_customer(cus: schemas.CustomerBase, db: AsyncSession = Depends(db.get_async_db("shop"))):
+    db_cust = model.Customer(**cus.dict())
+    db.add(db_cust)
+    await db.commit()
+    await db.refresh(db_cust)
+    return db_cust
+
+@router.get("/customer/", response_model=list[schemas.Customer])
+async def read_cust_list(request: Request, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None, fields: Optional[str] = None, db: AsyncSession = Depends(db.get_async_db("shop", readonly=True))):
+    page = KeysetPage(model.Customer, sort, cursor, limit, skip, sort_columns=("id", "name", "email"))
+    fieldset = Fieldset(model.Customer, schemas.Customer, fields)
+    result = await db.execute(page.apply(select(model.Customer).options(*fieldset.options(*page.columns))))
+    return fieldset.render(page.finish(result.scalars().all(), request, response), response)
+
+@router.get("/customer/{id}/", response_model=schemas.Customer)
+async def read_cust(id: int, db: AsyncSession = Depends(db.get_async_db("shop", readonly=True))):
+    db_cust = await db.get(model.Customer, id)
+    if db_cust is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return db_cust
+
+@router.put("/customer/{id}", response_model=schemas.Customer)
+async def update_cust(id: int, cus: schemas.CustomerBase, db: AsyncSession = Depends(db.get_async_db("shop"))):
+    db_cust = await db.get(model.Customer, id)
+    if db_cust is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+
+    for key, value in cus.dict().items():
+        setattr(db_cust, key, value)
+
+    await db.commit()
+    return db_cust
+
+@router.delete("/customer/{id}", response_model=schemas.Customer)
+async def delete_cust(id: int, db: AsyncSession = Depends(db.get_async_db("shop"))):
+    db_cust = await db.get(model.Customer, id)
+    if db_cust is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+
+    await db.delete(db_cust)
+    await db.commit()
+    return db_cust
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import model, schemas
+from app.fields import Fieldset
+from app.pagination import KeysetPage
+from typing import Optional
+from app import db
+
+router = APIRouter()
+
+@router.post("/create_order", response_model=schemas.Order)
+async def create_order(product: schemas.OrderBase, db: AsyncSession = Depends(db.get_async_db("shop"))):
+    db_order = model.Order(**product.dict())
+    db.add(db_order)
+    await db.commit()
+    await db.refresh(db_order)
+    return db_order
+
+@router.get("/order_list/", response_model=list[schemas.Order])
+async def read_order_list(request: Request, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None, fields: Optional[str] = None, db: AsyncSession = Depends(db.get_async_db("shop", readonly=True))):
+    page = KeysetPage(model.Order, sort, cursor, limit, skip, sort_columns=("id", "product_id", "customer_id", "quantity"))
+    fieldset = Fieldset(model.Order, schemas.Order, fields)
+    result = await db.execute(page.apply(select(model.Order).options(*fieldset.options(*page.columns))))
+    return fieldset.render(page.finish(result.scalars().all(), request, response), response)
+
+@router.get("/order/{id}/", response_model=schemas.Order)
+async def read_order(id: int, db: AsyncSession = Depends(db.get_async_db("shop", readonly=True))):
+    db_order = await db.get(model.Order, id)
+    if db_order is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return db_order
+
+@router.put("/order/{id}", response_model=schemas.Order)
+async def update_order(id: int, product: schemas.OrderBase, db: AsyncSession = Depends(db.get_async_db("shop"))):
+    db_order = await db.get(model.Order, id)
+    if db_order is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    for key, value in product.dict().items():
+        setattr(db_order, key, value)
+
+    await db.commit()
+    return db_order
+
+@router.delete("/order/{id}", response_model=schemas.Order)
+async def delete_order(id: int, db: AsyncSession = Depends(db.get_async_db("shop"))):
+    db_order = await db.get(model.Order, id)
+    if db_order is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    await db.delete(db_order)
+    await db.commit()
+    return db_order
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import model, schemas
+from app.fields import Fieldset
+from app.pagination import KeysetPage
+from typing import Optional
+from app import db
+
+router = APIRouter()
+
+@router.post("/create_product", response_model=schemas.Product)
+async def create_product(product: schemas.ProductCreate, db: AsyncSession = Depends(db.get_async_db("shop"))):
+    db_product = model.Product(**product.dict())
+    db.add(db_product)
+    await db.commit()
+    await db.refresh(db_product)
+    return db_product
+
+@router.get("/products_list/", response_model=list[schemas.Product])
+async def read_prod_list(request: Request, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None, fields: Optional[str] = None, db: AsyncSession = Depends(db.get_async_db("shop", readonly=True))):
+    page = KeysetPage(model.Product, sort, cursor, limit, skip, sort_columns=("id", "name", "price"))
+    fieldset = Fieldset(model.Product, schemas.Product, fields)
+    result = await db.execute(page.apply(select(model.Product).options(*fieldset.options(*page.columns))))
+    return fieldset.render(page.finish(result.scalars().all(), request, response), response)
+
+@router.get("/product/{product_id}/", response_model=schemas.Product)
+async def read_product(product_id: int, db: AsyncSession = Depends(db.get_async_db("shop", readonly=True))):
+    db_product = await db.get(model.Product, product_id)
+    if db_product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return db_product
+
+@router.put("/product_update/{product_id}", response_model=schemas.Product)
+async def update_product(product_id: int, product: schemas.ProductCreate, db: AsyncSession = Depends(db.get_async_db("shop"))):
+    db_product = await db.get(model.Product, product_id)
+    if db_product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    for key, value in product.dict().items():
+        setattr(db_product, key, value)
+
+    await db.commit()
+    return db_product
+
+@router.delete("/product/{product_id}", response_model=schemas.Product)
+async def delete_product(product_id: int, db: AsyncSession = Depends(db.get_async_db("shop"))):
+    db_product = await db.get(model.Product, product_id)
+    if db_product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    await db.delete(db_product)
+    await db.commit()
+    return db_product
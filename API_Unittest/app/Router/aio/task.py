@@ -0,0 +1,53 @@
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import db
+from app import model, schemas
+from app.fields import Fieldset
+from app.pagination import KeysetPage
+from typing import Optional
+
+router = APIRouter()
+
+
+@router.post("/tasks/{user_id}", response_model=schemas.Task)
+async def create_task(user_id: int, task: schemas.TaskBase, db: AsyncSession = Depends(db.get_async_db("task"))):
+    db_task = model.Task(
+        title = task.title,
+        description = task.description,
+        owner_id=user_id
+    )
+    db.add(db_task)
+    await db.commit()
+    await db.refresh(db_task)
+
+    return db_task
+
+@router.get("/tasks/", response_model=list[schemas.Task])
+async def read_tasks(request: Request, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None, fields: Optional[str] = None, db: AsyncSession = Depends(db.get_async_db("task", readonly=True))):
+    page = KeysetPage(model.Task, sort, cursor, limit, skip, sort_columns=("id", "title", "completed"))
+    fieldset = Fieldset(model.Task, schemas.Task, fields)
+    result = await db.execute(page.apply(select(model.Task).options(*fieldset.options(*page.columns))))
+    return fieldset.render(page.finish(result.scalars().all(), request, response), response)
+
+@router.put("/tasks/{task_id}", response_model=schemas.Task)
+async def update_task(task_id: int, task: schemas.TaskBase, db: AsyncSession = Depends(db.get_async_db("task"))):
+    db_task = await db.get(model.Task, task_id)
+    if db_task is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    for key, value in task.dict(exclude_unset=True).items():
+        setattr(db_task, key, value)
+
+    await db.commit()
+    return db_task
+
+@router.delete("/task/{task_id}", response_model=schemas.Task)
+async def delete_post(task_id: int, db: AsyncSession = Depends(db.get_async_db("task"))):
+    db_task = await db.get(model.Task, task_id)
+    if db_task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    await db.delete(db_task)
+    await db.commit()
+    return db_task
@@ -1,74 +1,80 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app import db 
 from app import model, schemas
-from app.dependencies import hash_password, verify_passwd, create_access_token, ACCESS_TOKEN_EXPIRATION
+from app.pagination import KeysetPage
+from app.ratelimit import auth_limiter
+from app.users import PREFIX_SEARCH_MAX, prefix_filter
+from app.roles import role_cache
+from app.user_import import IMPORT_MAX_BYTES, IMPORT_MAX_ROWS, UserImport, body_batches
+from app.dependencies import get_current_user, require_role, api_key_cache, hash_api_key, new_api_key, API_KEY_PREFIX_LENGTH, hash_password, verify_passwd, create_access_token, ACCESS_TOKEN_EXPIRATION
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
-from typing import List 
+from typing import List, Optional
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 router = APIRouter()
 
 
-def get_role(db: Session, role_name: str):
-    role = db.query(model.Roles).filter(model.Roles.name == role_name).first()
-    if not role:
-        role = model.Roles(name=role_name)
-        db.add(role)
-        db.commit()
-        db.refresh(role)
-    return role
+# The handlers that hash are async, so a request waiting on bcrypt holds no
+# threadpool thread; only their Session work runs in the threadpool
 
+def username_taken(db: Session, username: str) -> bool:
+    return db.query(model.User.id).filter(model.User.username_lower == username.lower()).first() is not None
 
-@router.post("/register_user", response_model=schemas.User)
-def reg(user: schemas.CreateUser, db: Session = Depends( db.get_db("auth"))):
-    db_user = db.query(model.User).filter(model.User.username == user.username).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username exists")
-    
-    hashed_pwd = hash_password(user.passwd)
+def create_user(db: Session, user: schemas.CreateUser, hashed_pwd: str, role_name: str):
     db_user = model.User(
         username=user.username,
         firstname=user.firstname,
         lastname=user.lastname,
         hashed_pwd=hashed_pwd
     )
-    user_role = get_role(db, "user")
-    db_user.roles.append(user_role)
     db.add(db_user)
+    try:
+        db.flush()
+    except IntegrityError:
+        # The unique username_lower index caught a registration that raced the check above
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Username exists")
+    # The role id comes from the cache, so this is a single insert and not a roles lookup
+    db.execute(insert(model.user_roles).values(user_id=db_user.id, role_id=role_cache.role_id(db, role_name)))
+    # Read before the commit expires db_user, which would cost a SELECT to reload
+    registered = schemas.User.model_validate(db_user, from_attributes=True)
     db.commit()
-    db.refresh(db_user)
 
-    return  db_user
+    return registered
 
-@router.post("/register_admin", response_model=schemas.User)
-def reg(user: schemas.CreateUser, db: Session = Depends(db.get_db("auth"))):
-    db_user = db.query(model.User).filter(model.User.username == user.username).first()
-    if db_user:
+async def register(user: schemas.CreateUser, role_name: str, db: Session):
+    if await run_in_threadpool(username_taken, db, user.username):
         raise HTTPException(status_code=400, detail="Username exists")
-    
-    hashed_pwd = hash_password(user.passwd)
-    db_user = model.User(
-        username=user.username,
-        firstname=user.firstname,
-        lastname=user.lastname,
-        hashed_pwd=hashed_pwd
-        
-    )
-    admin_role = get_role(db, "admin")
-    db_user.roles.append(admin_role)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
 
-    return  db_user
+    hashed_pwd = await hash_password(user.passwd)
+    return await run_in_threadpool(create_user, db, user, hashed_pwd, role_name)
+
+
+@router.post("/register_user", response_model=schemas.User)
+async def reg(request: Request, user: schemas.CreateUser, db: Session = Depends( db.get_db("auth"))):
+    # Throttled before the username lookup and the bcrypt hash
+    await auth_limiter.check_async(request, user.username)
+    return await register(user, "user", db)
+
+@router.post("/register_admin", response_model=schemas.User)
+async def reg_admin(request: Request, user: schemas.CreateUser, db: Session = Depends(db.get_db("auth"))):
+    # Throttled before the username lookup and the bcrypt hash
+    await auth_limiter.check_async(request, user.username)
+    return await register(user, "admin", db)
 
 
 @router.post("/login", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(db.get_db("auth"))):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(db.get_db("auth"))):
+    # Throttled before the password check
+    await auth_limiter.check_async(request, form_data.username)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -81,29 +87,90 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(model.User).filter(model.User.username == username).first()
-    if not user or not verify_passwd(password, user.hashed_pwd):
+def get_user(db: Session, username: str):
+    return db.query(model.User).filter(model.User.username == username).first()
+
+async def authenticate_user(db: Session, username: str, password: str):
+    user = await run_in_threadpool(get_user, db, username)
+    if not user or not await verify_passwd(password, user.hashed_pwd):
         return False
     return user
 
+@router.get("/me", response_model=schemas.CurrentUser)
+def read_me(user: schemas.CurrentUser = Depends(get_current_user)):
+    return user
+
+# API keys for machine clients, managed with a bearer token so a leaked key can't mint more
+@router.post("/api-keys", response_model=schemas.ApiKeyCreated)
+def create_api_key(body: schemas.ApiKeyCreate, user: schemas.CurrentUser = Depends(get_current_user), db: Session = Depends(db.get_db("auth"))):
+    key = new_api_key()
+    api_key = model.ApiKey(user_id=user.id, name=body.name, prefix=key[:API_KEY_PREFIX_LENGTH], key_hash=hash_api_key(key))
+    db.add(api_key)
+    db.commit()
+    db.refresh(api_key)
+    # The only time the key is shown, just its hash is stored
+    api_key.key = key
+    return api_key
+
+@router.get("/api-keys", response_model=List[schemas.ApiKey])
+def read_api_keys(user: schemas.CurrentUser = Depends(get_current_user), db: Session = Depends(db.get_db("auth", readonly=True))):
+    return db.query(model.ApiKey).filter(model.ApiKey.user_id == user.id).order_by(model.ApiKey.id).all()
+
+@router.delete("/api-keys/{key_id}", response_model=schemas.ApiKey)
+def revoke_api_key(key_id: int, user: schemas.CurrentUser = Depends(get_current_user), db: Session = Depends(db.get_db("auth"))):
+    api_key = db.query(model.ApiKey).filter(model.ApiKey.id == key_id, model.ApiKey.user_id == user.id).first()
+    if api_key is None:
+        raise HTTPException(status_code=404, detail="API key not found")
+    if api_key.revoked_at is None:
+        api_key.revoked_at = datetime.utcnow()
+        db.commit()
+        db.refresh(api_key)
+    # Other workers let it through until their cached entry expires
+    api_key_cache.pop(api_key.key_hash)
+    return api_key
+
 # get user by id
 @router.get("/users_i/{user_id}", response_model=schemas.User)
-def read_user_by_id(user_id: int, db: Session = Depends(db.get_db("auth"))):
+def read_user_by_id(user_id: int, db: Session = Depends(db.get_db("auth", readonly=True))):
     db_user = db.query(model.User).filter(model.User.id == user_id).first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
-# get user by user_name
+# get user by user_name, in any case
 @router.get("/users_n/{user_name}", response_model=schemas.User)
-def read_user_by_name(user_name: str, db: Session = Depends(db.get_db("auth"))):
-    db_user = db.query(model.User).filter(model.User.username == user_name).first()
+def read_user_by_name(user_name: str, db: Session = Depends(db.get_db("auth", readonly=True))):
+    db_user = db.query(model.User).filter(model.User.username_lower == user_name.lower()).first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
+# Usernames starting with prefix in any case, for the user picker's autocomplete
+@router.get("/users/search", response_model=List[schemas.User])
+def search_users(prefix: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=PREFIX_SEARCH_MAX), db: Session = Depends(db.get_db("auth", readonly=True))):
+    return (
+        db.query(model.User)
+        .filter(prefix_filter(model.User.username_lower, prefix.lower()))
+        .order_by(model.User.username_lower)
+        .limit(limit)
+        .all()
+    )
+
 # get all user
 @router.get("/users", response_model=List[schemas.User])
-def read_user(db: Session = Depends(db.get_db("auth")), skip: int = 0, limit: int = 10):
-    return  db.query(model.User).filter(model.User.username).offset(skip).limit(limit).all()
+def read_user(request: Request, response: Response, db: Session = Depends(db.get_db("auth", readonly=True)), skip: int = 0, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None):
+    page = KeysetPage(model.User, sort, cursor, limit, skip, sort_columns=("id", "username"))
+    return page.finish(page.apply(db.query(model.User).filter(model.User.username)).all(), request, response)
+
+# Create users in bulk from a CSV or NDJSON body, one record per line
+@router.post("/users/import", response_model=schemas.ImportReport)
+async def import_users(request: Request, format: str = "ndjson", role: str = "user", admin: schemas.CurrentUser = Depends(require_role("admin"))):
+    importer = UserImport(format, role, max_rows=IMPORT_MAX_ROWS)
+    try:
+        # Each batch hashes and commits in a worker thread while the body streams in
+        async for lines in body_batches(request.stream(), max_bytes=IMPORT_MAX_BYTES):
+            await run_in_threadpool(importer.feed, lines)
+    except HTTPException as e:
+        # The batches before the error are in, so say how far it got
+        return JSONResponse(importer.report(aborted=e.detail), status_code=e.status_code, headers=e.headers)
+    return importer.report()
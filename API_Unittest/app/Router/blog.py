@@ -1,13 +1,36 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, HTTPException, status, Depends, Request, Response
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session, raiseload
+from sqlalchemy.orm.attributes import set_committed_value
 from app import db 
 from app import model, schemas
+from app.bulk import BulkRequest
+from app.etag import make_etag, not_modified
+from app.expand import COMMENTS_CURSOR_HEADER, INLINE_COMMENTS_MAX, embed_first, expand_options, fill_unexpanded, parse_expand
+from app.export import stream_export
+from app.fields import Fieldset
+from app.pagination import KeysetPage
+from app.search import SearchPage
 from datetime import datetime, timedelta
-from typing import List
+from typing import Any, List, Optional
 
 
 router = APIRouter()
 
+# Nesting ?expand= can ask for; left out, it comes back as an empty list.
+# The defaults keep the response shape these routes always had.
+AUTHOR_EXPAND = {"posts": model.Author.posts, "posts.comments": model.Post.comments}
+POST_EXPAND = {"comments": model.Post.comments}
+
+# Comment counts come from the comments index, no comment body is read
+POST_SUMMARY = (
+    select(model.Post.id, model.Post.title, model.Post.author_id,
+           func.count(model.Comment.id).label("comment_count"),
+           func.max(model.Comment.id).label("last_comment_id"))
+    .outerjoin(model.Comment, model.Comment.post_id == model.Post.id)
+    .group_by(model.Post.id)
+)
+
 
 @router.post("/authors/", response_model=schemas.Author)
 def create_author(author: schemas.AuthorBase, db: Session = Depends(db.get_db("blog"))):
@@ -18,9 +41,14 @@ def create_author(author: schemas.AuthorBase, db: Session = Depends(db.get_db("b
     return db_author
 
 @router.get("/authors/", response_model=List[schemas.Author])
-def read_authors(skip: int = 0, limit: int = 10, db: Session = Depends(db.get_db("blog"))):
-    authors = db.query(model.Author).offset(skip).limit(limit).all()
-    return authors
+def read_authors(request: Request, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None, expand: Optional[str] = None, fields: Optional[str] = None, db: Session = Depends(db.get_db("blog", readonly=True))):
+    page = KeysetPage(model.Author, sort, cursor, limit, skip, sort_columns=("id", "name"))
+    fieldset = Fieldset(model.Author, schemas.Author, fields, nested={"posts": schemas.Post})
+    expand = fieldset.expand(expand, "posts,posts.comments")
+    options = expand_options(expand, AUTHOR_EXPAND, "posts,posts.comments")
+    query = db.query(model.Author).options(*options, *fieldset.options(*page.columns))
+    authors = fill_unexpanded(page.apply(query).all(), expand, AUTHOR_EXPAND, "posts,posts.comments")
+    return fieldset.render(page.finish(authors, request, response), response)
 
 @router.post("/posts/", response_model=schemas.Post)
 def create_post(post: schemas.PostBase, author_id:int, db: Session = Depends(db.get_db("blog"))):
@@ -34,18 +62,86 @@ def create_post(post: schemas.PostBase, author_id:int, db: Session = Depends(db.
     db.refresh(db_post)
     return db_post
 
+# One multi-row INSERT ... RETURNING in one transaction instead of a commit and
+# refresh per row. The ids are sorted back into item order: one writer holds the
+# database and each row gets max(id) + 1 in turn. Asking SQLAlchemy to keep the
+# order (sort_by_parameter_order) would go back to one INSERT per row on SQLite.
+@router.post("/posts/bulk", response_model=schemas.BulkCreated)
+def create_posts_bulk(items: List[Any] = Body(...), db: Session = Depends(db.get_db("blog"))):
+    bulk = BulkRequest(schemas.PostBulkItem, items, "author_id")
+    authors = db.scalars(select(model.Author.id).where(model.Author.id.in_(bulk.parent_ids())))
+    bulk.check_parents(set(authors), "Author")
+    values = bulk.values()
+    if not values:
+        return {"ids": []}
+    result = db.scalars(insert(model.Post).returning(model.Post.id), values)
+    ids = sorted(result.all())
+    db.commit()
+    return {"ids": ids}
+
 @router.get("/posts/", response_model=List[schemas.Post])
-def read_posts(skip: int=0, limit:int=10, db: Session = Depends(db.get_db("blog"))):
-    posts = db.query(model.Post).offset(skip).limit(limit).all()
-    return posts
+def read_posts(request: Request, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None, expand: Optional[str] = None, fields: Optional[str] = None, db: Session = Depends(db.get_db("blog", readonly=True))):
+    version = db.execute(select(model.collection_versions.c.version).where(model.collection_versions.c.name == "posts")).scalar()
+    cached = not_modified(request, response, make_etag("posts", version, request.url.query))
+    if cached:
+        return cached
+    page = KeysetPage(model.Post, sort, cursor, limit, skip, sort_columns=("id", "title", "author_id"))
+    fieldset = Fieldset(model.Post, schemas.Post, fields, nested={"comments": schemas.Comment})
+    expand = fieldset.expand(expand, "comments")
+    options = expand_options(expand, POST_EXPAND, "comments")
+    query = db.query(model.Post).options(*options, *fieldset.options(*page.columns))
+    posts = fill_unexpanded(page.apply(query).all(), expand, POST_EXPAND, "comments")
+    return fieldset.render(page.finish(posts, request, response), response)
+
+# Declared before /posts/{post_id} so "summary" is not taken for an id
+@router.get("/posts/summary", response_model=List[schemas.PostSummary])
+def read_post_summaries(request: Request, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None, db: Session = Depends(db.get_db("blog", readonly=True))):
+    version = db.execute(select(model.collection_versions.c.version).where(model.collection_versions.c.name == "posts")).scalar()
+    cached = not_modified(request, response, make_etag("posts-summary", version, request.url.query))
+    if cached:
+        return cached
+    page = KeysetPage(model.Post, sort, cursor, limit, skip, sort_columns=("id", "title", "author_id"))
+    return page.finish(db.execute(page.apply(POST_SUMMARY)).all(), request, response)
+
+# Declared before /posts/{post_id} so "search" is not taken for an id
+@router.get("/posts/search", response_model=List[schemas.SearchHit])
+def search_posts(q: str, request: Request, response: Response, scope: str = "posts", limit: int = 10, cursor: Optional[str] = None, db: Session = Depends(db.get_db("blog", readonly=True))):
+    page = SearchPage(q, scope, cursor, limit)
+    return page.finish(db.execute(page.statement(), page.params), request, response)
 
 @router.get("/posts/{post_id}", response_model=schemas.Post)
-def read_post(post_id: int, db: Session = Depends(db.get_db("blog"))):
-    db_post = db.query(model.Post).filter(model.Post.id == post_id).first()
+def read_post(post_id: int, request: Request, response: Response, expand: Optional[str] = None, db: Session = Depends(db.get_db("blog", readonly=True))):
+    version = db.execute(select(model.Post.version).where(model.Post.id == post_id)).scalar()
+    if version is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    cached = not_modified(request, response, make_etag("post", post_id, version, expand))
+    if cached:
+        return cached
+    db_post = db.query(model.Post).options(raiseload(model.Post.comments)).filter(model.Post.id == post_id).first()
     if db_post is None:
         raise HTTPException(status_code=404, detail="Post not found")
+    if "comments" in parse_expand(expand, POST_EXPAND, "comments"):
+        # Capped, a post with thousands of comments pages them from /posts/{post_id}/comments
+        comments = db.query(model.Comment).filter(model.Comment.post_id == post_id).order_by(model.Comment.id).limit(INLINE_COMMENTS_MAX + 1).all()
+        embed_first(db_post, "comments", comments, INLINE_COMMENTS_MAX, response, COMMENTS_CURSOR_HEADER)
+    else:
+        set_committed_value(db_post, "comments", [])
     return db_post
 
+@router.get("/posts/{post_id}/comments", response_model=List[schemas.Comment])
+def read_post_comments(post_id: int, request: Request, response: Response, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None, fields: Optional[str] = None, db: Session = Depends(db.get_db("blog", readonly=True))):
+    version = db.execute(select(model.Post.version).where(model.Post.id == post_id)).scalar()
+    if version is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    cached = not_modified(request, response, make_etag("post-comments", post_id, version, request.url.query))
+    if cached:
+        return cached
+    # ix_comments_post_id holds (post_id, rowid), so this walks the index in order
+    page = KeysetPage(model.Comment, sort, cursor, limit, sort_columns=("id",))
+    fieldset = Fieldset(model.Comment, schemas.Comment, fields)
+    query = db.query(model.Comment).filter(model.Comment.post_id == post_id).options(*fieldset.options(*page.columns))
+    return fieldset.render(page.finish(page.apply(query).all(), request, response), response)
+
 @router.put("/posts/{post_id}", response_model=schemas.Post)
 def update_post(post: schemas.PostBase, post_id:int, db: Session = Depends(db.get_db("blog"))):
     db_post = db.query(model.Post).filter(model.Post.id == post_id).first()
@@ -83,7 +179,27 @@ def comment_post(comment: schemas.CommentBase, post_id:int, db: Session = Depend
 
     return db_comment
 
+@router.post("/comments/bulk", response_model=schemas.BulkCreated)
+def create_comments_bulk(items: List[Any] = Body(...), db: Session = Depends(db.get_db("blog"))):
+    bulk = BulkRequest(schemas.CommentBulkItem, items, "post_id")
+    posts = db.scalars(select(model.Post.id).where(model.Post.id.in_(bulk.parent_ids())))
+    bulk.check_parents(set(posts), "Post")
+    values = bulk.values()
+    if not values:
+        return {"ids": []}
+    result = db.scalars(insert(model.Comment).returning(model.Comment.id), values)
+    ids = sorted(result.all())
+    db.commit()
+    return {"ids": ids}
+
 @router.get("/comments/", response_model=List[schemas.Comment])
-def read_comments(skip: int=0, limit:int=10, db: Session = Depends(db.get_db("blog"))):
-    comments = db.query(model.Comment).offset(skip).limit(limit).all()
-    return comments
+def read_comments(request: Request, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None, fields: Optional[str] = None, db: Session = Depends(db.get_db("blog", readonly=True))):
+    page = KeysetPage(model.Comment, sort, cursor, limit, skip, sort_columns=("id", "post_id"))
+    fieldset = Fieldset(model.Comment, schemas.Comment, fields)
+    query = db.query(model.Comment).options(*fieldset.options(*page.columns))
+    return fieldset.render(page.finish(page.apply(query).all(), request, response), response)
+
+# Nightly NDJSON dumps: one line per row in id order, resume with after_id
+@router.get("/export/{kind}")
+def export(kind: str, after_id: int = 0, gzip: bool = False):
+    return stream_export(kind, after_id, gzip)
@@ -1,6 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from app import model, schemas, dependencies
+from app.fields import Fieldset
+from app.pagination import KeysetPage
+from typing import Optional
 from app import db 
 
 router = APIRouter()
@@ -15,11 +18,14 @@ def create_category(section: schemas.CategoryBase, db:Session = Depends(db.get_d
     return db_cat
 
 @router.get("/cat_list/", response_model=list[schemas.Category])
-def read_cat_list(skip: int = 0, limit: int = 10, db: Session = Depends(db.get_db("shop"))):
-    return db.query(model.Category).offset(skip).limit(limit).all()
+def read_cat_list(request: Request, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None, fields: Optional[str] = None, db: Session = Depends(db.get_db("shop", readonly=True))):
+    page = KeysetPage(model.Category, sort, cursor, limit, skip, sort_columns=("id", "name"))
+    fieldset = Fieldset(model.Category, schemas.Category, fields)
+    query = db.query(model.Category).options(*fieldset.options(*page.columns))
+    return fieldset.render(page.finish(page.apply(query).all(), request, response), response)
 
 @router.get("/category/{id}/", response_model=schemas.Category)
-def read_cat(id: int, db: Session = Depends(db.get_db("shop"))):
+def read_cat(id: int, db: Session = Depends(db.get_db("shop", readonly=True))):
     db_cat = db.query(model.Category).filter(model.Category.id == id).first()
     if db_cat is None:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -1,6 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from app import model, schemas, dependencies
+from app.fields import Fieldset
+from app.pagination import KeysetPage
+from typing import Optional
 from app import db 
 
 router = APIRouter()
@@ -20,11 +23,14 @@ def create_customer(cus: schemas.CustomerBase, db:Session = Depends(db.get_db("s
         return e
 
 @router.get("/customer/", response_model=list[schemas.Customer])
-def read_cust_list(skip: int = 0, limit: int = 10, db: Session = Depends(db.get_db("shop"))):
-    return db.query(model.Customer).offset(skip).limit(limit).all()
+def read_cust_list(request: Request, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None, fields: Optional[str] = None, db: Session = Depends(db.get_db("shop", readonly=True))):
+    page = KeysetPage(model.Customer, sort, cursor, limit, skip, sort_columns=("id", "name", "email"))
+    fieldset = Fieldset(model.Customer, schemas.Customer, fields)
+    query = db.query(model.Customer).options(*fieldset.options(*page.columns))
+    return fieldset.render(page.finish(page.apply(query).all(), request, response), response)
 
 @router.get("/customer/{id}/", response_model=schemas.Customer)
-def read_cust(id: int, db: Session = Depends(db.get_db("shop"))):
+def read_cust(id: int, db: Session = Depends(db.get_db("shop", readonly=True))):
     db_cust = db.query(model.Customer).filter(model.Customer.id == id).first()
     if db_cust is None:
         raise HTTPException(status_code=404, detail="Customer not found")
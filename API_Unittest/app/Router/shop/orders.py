@@ -1,6 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from app import model, schemas, dependencies
+from app.fields import Fieldset
+from app.pagination import KeysetPage
+from typing import Optional
 from app import db 
 
 router = APIRouter()
@@ -18,11 +21,14 @@ def create_order(product: schemas.OrderBase, db:Session = Depends(db.get_db("sho
     return db_order
 
 @router.get("/order_list/", response_model=list[schemas.Order])
-def read_order_list(skip: int = 0, limit: int = 10, db: Session = Depends(db.get_db("shop"))):
-    return db.query(model.Order).offset(skip).limit(limit).all()
+def read_order_list(request: Request, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None, fields: Optional[str] = None, db: Session = Depends(db.get_db("shop", readonly=True))):
+    page = KeysetPage(model.Order, sort, cursor, limit, skip, sort_columns=("id", "product_id", "customer_id", "quantity"))
+    fieldset = Fieldset(model.Order, schemas.Order, fields)
+    query = db.query(model.Order).options(*fieldset.options(*page.columns))
+    return fieldset.render(page.finish(page.apply(query).all(), request, response), response)
 
 @router.get("/order/{id}/", response_model=schemas.Order)
-def read_order(id: int, db: Session = Depends(db.get_db("shop"))):
+def read_order(id: int, db: Session = Depends(db.get_db("shop", readonly=True))):
     db_order = db.query(model.Order).filter(model.Order.id == id).first()
     if db_order is None:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -1,6 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from app import model, schemas, dependencies
+from app.fields import Fieldset
+from app.pagination import KeysetPage
+from typing import Optional
 from app import db 
 
 router = APIRouter()
@@ -19,11 +22,14 @@ def create_product(product: schemas.ProductCreate, db:Session = Depends(db.get_d
     return db_product
 
 @router.get("/products_list/", response_model=list[schemas.Product])
-def read_prod_list(skip: int = 0, limit: int = 10, db: Session = Depends(db.get_db("shop"))):
-    return db.query(model.Product).offset(skip).limit(limit).all()
+def read_prod_list(request: Request, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None, fields: Optional[str] = None, db: Session = Depends(db.get_db("shop", readonly=True))):
+    page = KeysetPage(model.Product, sort, cursor, limit, skip, sort_columns=("id", "name", "price"))
+    fieldset = Fieldset(model.Product, schemas.Product, fields)
+    query = db.query(model.Product).options(*fieldset.options(*page.columns))
+    return fieldset.render(page.finish(page.apply(query).all(), request, response), response)
 
 @router.get("/product/{product_id}/", response_model=schemas.Product)
-def read_product(product_id: int, db: Session = Depends(db.get_db("shop"))):
+def read_product(product_id: int, db: Session = Depends(db.get_db("shop", readonly=True))):
     db_product = db.query(model.Product).filter(model.Product.id == product_id).first()
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
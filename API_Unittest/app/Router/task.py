@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
 from sqlalchemy.orm import Session
 from app import db 
 from app import model, schemas
+from app.fields import Fieldset
+from app.pagination import KeysetPage
+from typing import Optional
 
 router = APIRouter()
 
@@ -20,8 +23,11 @@ def create_task(user_id: int, task: schemas.TaskBase, db: Session = Depends(db.g
     return db_task
 
 @router.get("/tasks/", response_model=list[schemas.Task])
-def read_tasks(skip: int = 0, limit: int = 10, db: Session = Depends(db.get_db("task"))):
-    return db.query(model.Task).offset(skip).limit(limit).all()
+def read_tasks(request: Request, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, sort: Optional[str] = None, fields: Optional[str] = None, db: Session = Depends(db.get_db("task", readonly=True))):
+    page = KeysetPage(model.Task, sort, cursor, limit, skip, sort_columns=("id", "title", "completed"))
+    fieldset = Fieldset(model.Task, schemas.Task, fields)
+    query = db.query(model.Task).options(*fieldset.options(*page.columns))
+    return fieldset.render(page.finish(page.apply(query).all(), request, response), response)
 
 @router.put("/tasks/{task_id}", response_model=schemas.Task)
 def update_task(task_id: int, task: schemas.TaskBase, db: Session = Depends(db.get_db("task"))):
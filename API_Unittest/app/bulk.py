@@ -0,0 +1,42 @@
+import os
+from typing import Any, List
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+
+# Largest array a bulk endpoint takes in one request
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+
+
+class BulkRequest:
+    """Validate a bulk create body item by item.
+
+    Every failing item is reported with its index; nothing is inserted
+    unless all of them pass, so a retry after fixing them cannot duplicate rows.
+    """
+    def __init__(self, item_schema, items: List[Any], parent_key: str):
+        if len(items) > BULK_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items per request")
+        self.parent_key = parent_key
+        self.rows = []
+        self.errors = {}
+        for index, item in enumerate(items):
+            try:
+                self.rows.append((index, item_schema.parse_obj(item).dict()))
+            except ValidationError as e:
+                self.errors[index] = [{"loc": list(error["loc"]), "msg": error["msg"]} for error in e.errors()]
+
+    def parent_ids(self) -> set:
+        return {row[self.parent_key] for _, row in self.rows}
+
+    def check_parents(self, existing_ids, parent_name: str):
+        for index, row in self.rows:
+            if row[self.parent_key] not in existing_ids:
+                self.errors[index] = [{"loc": [self.parent_key], "msg": f"{parent_name} not found"}]
+
+    def values(self) -> List[dict]:
+        if self.errors:
+            raise HTTPException(status_code=422, detail=[
+                {"index": index, "errors": errors} for index, errors in sorted(self.errors.items())
+            ])
+        return [row for _, row in self.rows]
@@ -1,19 +1,203 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from . import query_stats
+from .metrics import metrics, TimedAsyncAdaptedQueuePool, TimedQueuePool
+
+
+# "sync" serves the routers in app/Router, "async" the ones in app/Router/aio
+DB_MODE = os.getenv("DB_MODE", "sync")
+
+# Pool sizing per database, anything missing falls back to "default",
+# and "<name>_ro" sizes the read-only pool of a database
+POOL_SETTINGS = {
+    "default": {"pool_size": 5, "max_overflow": 10, "pool_timeout": 30},
+    "blog_ro": {"pool_size": 10, "max_overflow": 20},
+    "shop": {"pool_size": 10, "max_overflow": 20, "pool_timeout": 30},
+}
+
+# PRAGMAs run on every new connection, anything missing falls back to "default".
+# blog.db is mostly reads so it gets a bigger cache and mmap window, shop.db
+# takes the order bursts so it waits longer on a locked database.
+SQLITE_PRAGMAS = {
+    "default": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 64 * 1024 * 1024,
+        "cache_size": -16000,
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    },
+    "auth": {"synchronous": "FULL"},
+    "blog": {"mmap_size": 256 * 1024 * 1024, "cache_size": -64000},
+    "shop": {"cache_size": -32000, "busy_timeout": 15000},
+}
+
+
 class ChooseDB:
-    def __init__(self):
+    def __init__(self, pool_settings: dict = None, pragmas: dict = None, mode: str = DB_MODE):
         self.auth_db_url = "sqlite:///./auth.db"
         self.blog_db_url = "sqlite:///./blog.db"
         self.task_db_url = "sqlite:///./task.db"
         self.shop_db_url = "sqlite:///./shop.db"
+        self.db_names = ("auth", "blog", "task", "shop")
+        self.pool_settings = pool_settings or POOL_SETTINGS
+        self.pragmas = pragmas or SQLITE_PRAGMAS
+        self.mode = mode
+
+        # One engine and one sessionmaker per (database, readonly) for the whole process
+        self._engines = {}
+        self._session_locals = {}
+        self._async_engines = {}
+        self._async_session_locals = {}
+        self._initializers = []
 
-    def get_engine(self, db_name):
+    def add_initializer(self, initializer):
+        """Run initializer(db_name, engine) whenever a writer engine is created."""
+        self._initializers.append(initializer)
+
+    def get_db_url(self, db_name, readonly=False):
         db_url = getattr(self, f"{db_name}_db_url")
-        return create_engine(db_url, connect_args={"check_same_thread": False})
-    
-    def get_session_local(self, db_name):
-        engine = self.get_engine(db_name)
-        return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        if readonly:
+            # sqlite:///./blog.db -> sqlite:///file:./blog.db?mode=ro&uri=true
+            db_url = db_url.replace(":///", ":///file:", 1) + "?mode=ro&uri=true"
+        return db_url
+
+    def get_pool_settings(self, db_name, readonly=False):
+        settings = dict(self.pool_settings.get("default", {}))
+        settings.update(self.pool_settings.get(db_name, {}))
+        if readonly:
+            settings.update(self.pool_settings.get(f"{db_name}_ro", {}))
+        return settings
+
+    def get_pragmas(self, db_name, readonly=False):
+        pragmas = dict(self.pragmas.get("default", {}))
+        pragmas.update(self.pragmas.get(db_name, {}))
+        if readonly:
+            # The journal mode belongs to the writer, readers just refuse to write
+            pragmas.pop("journal_mode", None)
+            pragmas["query_only"] = 1
+        return pragmas
+
+    def apply_pragmas(self, engine, db_name, readonly=False):
+        pragmas = self.get_pragmas(db_name, readonly)
+
+        @event.listens_for(engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+        return engine
+
+    def read_pragmas(self, db_name, readonly=False):
+        """Return the PRAGMA values actually in effect on a pooled connection."""
+        names = list(self.get_pragmas(db_name))
+        if readonly:
+            names.append("query_only")
+        with self.get_engine(db_name, readonly).connect() as conn:
+            return {name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names}
+
+    def create_engine(self, db_name, readonly=False):
+        engine = create_engine(
+            self.get_db_url(db_name, readonly),
+            connect_args={"check_same_thread": False},
+            poolclass=TimedQueuePool,
+            **self.get_pool_settings(db_name, readonly)
+        )
+        metrics.instrument_engine(engine, db_name, readonly)
+        query_stats.instrument_engine(engine)
+        return self.apply_pragmas(engine, db_name, readonly)
+
+    def get_engine(self, db_name, readonly=False):
+        engine = self._engines.get((db_name, readonly))
+        if engine is None:
+            if readonly:
+                # mode=ro cannot create the file, let the writer set it up first
+                self.get_engine(db_name)
+            engine = self.create_engine(db_name, readonly)
+            self._engines[(db_name, readonly)] = engine
+            if not readonly:
+                for initializer in self._initializers:
+                    initializer(db_name, engine)
+        return engine
+
+    def get_session_local(self, db_name, readonly=False):
+        session_local = self._session_locals.get((db_name, readonly))
+        if session_local is None:
+            engine = self.get_engine(db_name, readonly)
+            session_local = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            metrics.instrument_sessions(session_local, db_name, readonly)
+            self._session_locals[(db_name, readonly)] = session_local
+        return session_local
+
+    def create_async_engine(self, db_name, readonly=False):
+        # aiosqlite is only needed when the async routers are in use
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        db_url = self.get_db_url(db_name, readonly).replace("sqlite://", "sqlite+aiosqlite://", 1)
+        engine = create_async_engine(
+            db_url,
+            poolclass=TimedAsyncAdaptedQueuePool,
+            **self.get_pool_settings(db_name, readonly)
+        )
+        metrics.instrument_engine(engine.sync_engine, db_name, readonly)
+        query_stats.instrument_engine(engine.sync_engine)
+        self.apply_pragmas(engine.sync_engine, db_name, readonly)
+        return engine
+
+    def get_async_engine(self, db_name, readonly=False):
+        engine = self._async_engines.get((db_name, readonly))
+        if engine is None:
+            self.get_engine(db_name)
+            engine = self.create_async_engine(db_name, readonly)
+            self._async_engines[(db_name, readonly)] = engine
+        return engine
+
+    def get_async_session_local(self, db_name, readonly=False):
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        session_local = self._async_session_locals.get((db_name, readonly))
+        if session_local is None:
+            engine = self.get_async_engine(db_name, readonly)
+            # Session events can't target an async_sessionmaker, so each one gets
+            # its own sync Session class to hang the commit timing on
+            sync_session_class = metrics.instrument_sessions(type("AsyncBackedSession", (Session,), {}), db_name, readonly)
+            # Objects stay usable after commit, nothing may lazy load outside the loop
+            session_local = async_sessionmaker(engine, autoflush=False, expire_on_commit=False, sync_session_class=sync_session_class)
+            self._async_session_locals[(db_name, readonly)] = session_local
+        return session_local
+
+    def set_engine(self, db_name, engine, readonly_engine=None):
+        """Swap in engines for db_name (used by tests), disposing the old ones.
+
+        Reads go through engine as well unless a separate readonly_engine is given.
+        """
+        self.dispose(db_name)
+        self._engines[(db_name, False)] = engine
+        self._engines[(db_name, True)] = readonly_engine or engine
+
+    async def set_async_engine(self, db_name, engine, readonly_engine=None):
+        """set_engine for the async routers; awaited, as closing aiosqlite connections is."""
+        await self.dispose_async(db_name)
+        for readonly, value in ((False, engine), (True, readonly_engine or engine)):
+            self._async_engines[(db_name, readonly)] = value
+            self._async_session_locals.pop((db_name, readonly), None)
+
+    def dispose(self, db_name=None):
+        keys = [key for key in self._engines if db_name in (None, key[0])]
+        for key in keys:
+            engine = self._engines.pop(key)
+            self._session_locals.pop(key, None)
+            engine.dispose()
+
+    async def dispose_async(self, db_name=None):
+        keys = [key for key in self._async_engines if db_name in (None, key[0])]
+        for key in keys:
+            engine = self._async_engines.pop(key)
+            self._async_session_locals.pop(key, None)
+            await engine.dispose()
 
 # Global instance
 db_chooser = ChooseDB()
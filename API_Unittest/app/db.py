@@ -1,3 +1,4 @@
+from functools import lru_cache
 from sqlalchemy import MetaData
 from sqlalchemy.ext.declarative import declarative_base
 from .choose_db import db_chooser
@@ -6,12 +7,31 @@ from .choose_db import db_chooser
 metadata = MetaData()
 Base = declarative_base()
 
-def get_db(db_name: str):
+def get_db(db_name: str, readonly: bool = False):
+    """Session dependency for db_name; readonly=True uses the read-only pool."""
+    return _get_db(db_name, readonly)
+
+# Cached so get_db("blog") is the same callable every time and can be
+# used as a key in app.dependency_overrides
+@lru_cache(maxsize=None)
+def _get_db(db_name: str, readonly: bool):
     def get_db_instance():
-        SessionLocal = db_chooser.get_session_local(db_name)
+        SessionLocal = db_chooser.get_session_local(db_name, readonly)
         db = SessionLocal()
         try:
             yield db
         finally:
             db.close()
     return get_db_instance
+
+
+def get_async_db(db_name: str, readonly: bool = False):
+    return _get_async_db(db_name, readonly)
+
+@lru_cache(maxsize=None)
+def _get_async_db(db_name: str, readonly: bool):
+    async def get_async_db_instance():
+        SessionLocal = db_chooser.get_async_session_local(db_name, readonly)
+        async with SessionLocal() as db:
+            yield db
+    return get_async_db_instance
@@ -1,26 +1,61 @@
-from fastapi import HTTPException
-from sqlalchemy.orm import Session
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from itertools import chain
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, joinedload
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime, timedelta 
-from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
+from typing import Optional
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
 from jose import JWTError, jwt
 
-from app import model
+from app import model, schemas
+from app.cache import LRUCache
+from app.db import db_chooser
+from app.hashing import hasher
 
 
 SECRET_KEY = "blog"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRATION = 30
 
-oauth2 = OAuth2PasswordBearer(tokenUrl="login")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Put get_current_user in front of the task and shop routers
+REQUIRE_AUTH = os.getenv("REQUIRE_AUTH", "0") == "1"
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+# Upper bound on staleness for writes the session events below can't see (raw SQL)
+USER_CACHE_TTL = 300
+# Keyed so a leaked api_keys table can't be checked against guesses offline
+API_KEY_SECRET = os.getenv("API_KEY_SECRET", SECRET_KEY)
+API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", "10000"))
+# How long another worker may still accept a key revoked elsewhere
+API_KEY_CACHE_TTL = 60
+API_KEY_PREFIX_LENGTH = 8
 
+oauth2 = OAuth2PasswordBearer(tokenUrl="auth/login")
+# Optional versions for get_caller, which takes either one
+oauth2_optional = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+# token -> verified claims, until the token's exp
+claims_cache = LRUCache(TOKEN_CACHE_SIZE)
+# username -> schemas.CurrentUser, dropped when the user or any role changes
+user_cache = LRUCache(USER_CACHE_SIZE)
+# key hash -> username, dropped on revoke
+api_key_cache = LRUCache(API_KEY_CACHE_SIZE)
 
-def verify_passwd(plain_password:str, db_hashed_pwd:str) -> bool:
-    return pwd_context.verify(plain_password, db_hashed_pwd)
+
+# bcrypt runs in the hashing process pool, these block the calling thread until it is done
+# Awaited, so the caller holds no thread while bcrypt runs in the hashing pool
+async def hash_password(password: str) -> str:
+    return await hasher.hash_async(password)
+
+async def verify_passwd(plain_password:str, db_hashed_pwd:str) -> bool:
+    return await hasher.verify_async(plain_password, db_hashed_pwd)
 
 def create_access_token(data:dict, expires:timedelta = None) -> str:
     encode = data.copy()
@@ -31,3 +66,134 @@ def create_access_token(data:dict, expires:timedelta = None) -> str:
     encode.update({"exp": exp})
     encode_jwt = jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
     return encode_jwt
+
+
+def credentials_error():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def decode_token(token: str) -> dict:
+    claims = claims_cache.get(token)
+    if claims is None:
+        try:
+            # Checks the signature and exp
+            claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise credentials_error()
+        if not claims.get("sub") or "exp" not in claims:
+            raise credentials_error()
+        claims_cache.set(token, claims, expires_at=claims["exp"])
+    return claims
+
+def load_user(username: str):
+    SessionLocal = db_chooser.get_session_local("auth", readonly=True)
+    with SessionLocal() as db:
+        user = db.query(model.User).options(joinedload(model.User.roles)).filter(model.User.username == username).first()
+        if user is None:
+            return None
+        return schemas.CurrentUser(
+            id=user.id,
+            username=user.username,
+            firstname=user.firstname,
+            lastname=user.lastname,
+            active=user.active,
+            roles=sorted(role.name for role in user.roles),
+        )
+
+async def cached_user(username: str) -> schemas.CurrentUser:
+    user = user_cache.get(username)
+    if user is None:
+        user = await run_in_threadpool(load_user, username)
+        if user is None:
+            raise credentials_error()
+        user_cache.set(user.username, user, expires_at=time.time() + USER_CACHE_TTL)
+    if not user.active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
+    return user
+
+async def get_current_user(token: str = Depends(oauth2)) -> schemas.CurrentUser:
+    """The user a bearer token belongs to.
+
+    A token seen before and a user looked up before are both answered from
+    memory, so on the hot path this runs no SQL and never leaves the event loop.
+    """
+    return await cached_user(decode_token(token)["sub"])
+
+
+def new_api_key() -> str:
+    return "sk_" + secrets.token_urlsafe(32)
+
+def hash_api_key(key: str) -> str:
+    # Keys are random, a fast hash is enough; bcrypt would put every request back in the hashing pool
+    return hmac.new(API_KEY_SECRET.encode(), key.encode(), hashlib.sha256).hexdigest()
+
+def load_api_key(key_hash: str):
+    """Username of a live key, by its unique key_hash index."""
+    SessionLocal = db_chooser.get_session_local("auth", readonly=True)
+    with SessionLocal() as db:
+        return db.scalar(
+            select(model.User.username)
+            .join(model.ApiKey, model.ApiKey.user_id == model.User.id)
+            .where(model.ApiKey.key_hash == key_hash, model.ApiKey.revoked_at.is_(None))
+        )
+
+async def user_for_api_key(key: str) -> schemas.CurrentUser:
+    key_hash = hash_api_key(key)
+    username = api_key_cache.get(key_hash)
+    if username is None:
+        username = await run_in_threadpool(load_api_key, key_hash)
+        if username is None:
+            raise credentials_error()
+        api_key_cache.set(key_hash, username, expires_at=time.time() + API_KEY_CACHE_TTL)
+    return await cached_user(username)
+
+async def get_caller(token: Optional[str] = Depends(oauth2_optional), api_key: Optional[str] = Depends(api_key_header)) -> schemas.CurrentUser:
+    """get_current_user for routes machine clients call too.
+
+    Takes an X-API-Key header or a bearer token. Known keys are answered from
+    memory like tokens; an unknown one costs one indexed lookup and no bcrypt.
+    """
+    if api_key:
+        return await user_for_api_key(api_key)
+    if token:
+        return await get_current_user(token)
+    raise credentials_error()
+
+def require_role(role_name: str):
+    """Dependency that lets through users holding role_name, 403 for the rest."""
+    async def check_role(user: schemas.CurrentUser = Depends(get_current_user)) -> schemas.CurrentUser:
+        if role_name not in user.roles:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Requires the {role_name} role")
+        return user
+    return check_role
+
+def invalidate_user(user_id: int):
+    """For writes to users or user_roles that bypass the ORM session."""
+    user_cache.discard_where(lambda user: user.id == user_id)
+
+
+# Every Session, sync or the one behind an AsyncSession, reports user and
+# role changes; the cache is only dropped once they are committed
+@event.listens_for(Session, "after_flush")
+def _collect_user_changes(session, flush_context):
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, model.User):
+            session.info.setdefault("changed_user_ids", set()).add(obj.id)
+        elif isinstance(obj, model.Roles):
+            session.info["roles_changed"] = True
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_users(session):
+    user_ids = session.info.pop("changed_user_ids", None)
+    if session.info.pop("roles_changed", False):
+        user_cache.clear()
+    elif user_ids:
+        user_cache.discard_where(lambda user: user.id in user_ids)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_user_changes(session, previous_transaction):
+    session.info.pop("changed_user_ids", None)
+    session.info.pop("roles_changed", None)
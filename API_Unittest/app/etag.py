@@ -0,0 +1,62 @@
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+from sqlalchemy import text
+
+
+# Post.version and collection_versions are bumped by triggers, so the sync
+# and async routers and any bulk or raw SQL write all invalidate the tags.
+# The "posts" collection covers every list page of posts, comments
+# included since they are embedded in the list.
+VERSION_DDL = [
+    "INSERT OR IGNORE INTO collection_versions (name, version) VALUES ('posts', 1)",
+    """CREATE TRIGGER IF NOT EXISTS posts_version_au AFTER UPDATE OF title, content, author_id ON posts BEGIN
+        UPDATE posts SET version = version + 1 WHERE id = new.id;
+        UPDATE collection_versions SET version = version + 1 WHERE name = 'posts';
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_version_ai AFTER INSERT ON posts BEGIN
+        UPDATE collection_versions SET version = version + 1 WHERE name = 'posts';
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_version_ad AFTER DELETE ON posts BEGIN
+        UPDATE collection_versions SET version = version + 1 WHERE name = 'posts';
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comments_version_ai AFTER INSERT ON comments BEGIN
+        UPDATE posts SET version = version + 1 WHERE id = new.post_id;
+        UPDATE collection_versions SET version = version + 1 WHERE name = 'posts';
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comments_version_au AFTER UPDATE ON comments BEGIN
+        UPDATE posts SET version = version + 1 WHERE id IN (old.post_id, new.post_id);
+        UPDATE collection_versions SET version = version + 1 WHERE name = 'posts';
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comments_version_ad AFTER DELETE ON comments BEGIN
+        UPDATE posts SET version = version + 1 WHERE id = old.post_id;
+        UPDATE collection_versions SET version = version + 1 WHERE name = 'posts';
+    END""",
+]
+
+
+def init_versions(conn):
+    for statement in VERSION_DDL:
+        conn.execute(text(statement))
+
+
+def make_etag(*parts) -> str:
+    # Weak: the tag follows the data, not the exact bytes on the wire
+    raw = ".".join(map(str, parts))
+    return f'W/"{hashlib.blake2s(raw.encode(), digest_size=8).hexdigest()}"'
+
+
+def not_modified(request: Request, response: Response, tag: str) -> Optional[Response]:
+    """Return a 304 if the request already has tag, otherwise set it on response.
+
+    Handlers look up the version before loading any rows, so a tag can only be
+    older than the body it goes out with, never newer.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Weak comparison, per RFC 9110 section 13.1.2
+        tags = {value.strip().removeprefix("W/") for value in if_none_match.split(",")}
+        if "*" in tags or tag.removeprefix("W/") in tags:
+            return Response(status_code=304, headers={"ETag": tag})
+    response.headers["ETag"] = tag
+    return None
@@ -0,0 +1,83 @@
+import os
+from typing import Dict, Optional
+from fastapi import HTTPException, Response
+from sqlalchemy.orm import raiseload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from app.pagination import encode_cursor
+
+
+# Most comments GET /blog/posts/{post_id} embeds, the rest are paged from
+# /blog/posts/{post_id}/comments starting at the X-Comments-Next-Cursor header
+INLINE_COMMENTS_MAX = max(1, int(os.getenv("INLINE_COMMENTS_MAX", "50")))
+COMMENTS_CURSOR_HEADER = "X-Comments-Next-Cursor"
+
+
+def parse_expand(expand: Optional[str], paths: Dict[str, object], default: str) -> set:
+    """Turn "posts,posts.comments" into a set of paths, parents included."""
+    if expand is None:
+        expand = default
+    requested = {path.strip() for path in expand.split(",") if path.strip()}
+    unknown = requested - set(paths)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot expand {', '.join(sorted(unknown))}, choose from {', '.join(paths)}"
+        )
+    for path in list(requested):
+        while "." in path:
+            path = path.rpartition(".")[0]
+            requested.add(path)
+    return requested
+
+
+def expand_options(expand: Optional[str], paths: Dict[str, object], default: str = ""):
+    """Loader options for a ?expand= parameter.
+
+    paths maps dotted relationship paths to attributes, e.g.
+    {"posts": Author.posts, "posts.comments": Post.comments}. Expanded paths
+    are batched with selectinload, one extra query per level whatever the
+    page size; the rest use raiseload, so nothing lazy loads them, and
+    fill_unexpanded gives them their empty lists once the rows are loaded.
+    """
+    return _options("", None, paths, parse_expand(expand, paths, default))
+
+
+def _options(prefix, loader, paths, requested):
+    options = []
+    for path, attr in paths.items():
+        if path.rpartition(".")[0] != prefix:
+            continue
+        if path in requested:
+            child = loader.selectinload(attr) if loader is not None else selectinload(attr)
+            options.extend(_options(path, child, paths, requested) or [child])
+        else:
+            options.append(loader.raiseload(attr) if loader is not None else raiseload(attr))
+    return options
+
+
+def fill_unexpanded(objects, expand: Optional[str], paths: Dict[str, object], default: str = ""):
+    """Set the relationships expand_options left unloaded to empty lists, returns objects."""
+    _fill(objects, "", paths, parse_expand(expand, paths, default))
+    return objects
+
+
+def _fill(objects, prefix, paths, requested):
+    for path, attr in paths.items():
+        if path.rpartition(".")[0] != prefix:
+            continue
+        if path in requested:
+            _fill([child for obj in objects for child in getattr(obj, attr.key)], path, paths, requested)
+        else:
+            for obj in objects:
+                set_committed_value(obj, attr.key, [])
+
+
+def embed_first(parent, attr: str, rows, limit: int, response: Response, header: str):
+    """Set parent.attr to the first limit of rows (fetched with limit + 1 in id order).
+
+    If there were more, header gets the cursor the child list endpoint
+    continues from. Nothing is marked dirty, parent stays as loaded.
+    """
+    set_committed_value(parent, attr, rows[:limit])
+    if len(rows) > limit:
+        response.headers[header] = encode_cursor({"k": [rows[limit - 1].id], "d": "next", "s": "id"})
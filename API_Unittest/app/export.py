@@ -0,0 +1,80 @@
+import json
+import zlib
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from app import model
+from app.db import db_chooser
+
+
+# Rows fetched per round trip; memory stays at one batch whatever the table size
+EXPORT_BATCH = 1000
+
+EXPORT_COLUMNS = {
+    "authors": (model.Author.id, model.Author.name),
+    "posts": (model.Post.id, model.Post.title, model.Post.content, model.Post.author_id),
+    "comments": (model.Comment.id, model.Comment.content, model.Comment.post_id),
+}
+
+
+def export_statement(kind: str, after_id: int):
+    """Rows of kind with id > after_id in id order, as plain column tuples."""
+    if kind not in EXPORT_COLUMNS:
+        raise HTTPException(status_code=404, detail=f"Cannot export {kind}, choose from {', '.join(EXPORT_COLUMNS)}")
+    columns = EXPORT_COLUMNS[kind]
+    id_column = columns[0]
+    return (
+        select(*columns)
+        .where(id_column > after_id)
+        .order_by(id_column)
+        .execution_options(yield_per=EXPORT_BATCH)
+    )
+
+
+def ndjson(rows) -> bytes:
+    return "".join(json.dumps(dict(row._mapping), separators=(",", ":")) + "\n" for row in rows).encode()
+
+
+def export_response(chunks, kind: str, gzip: bool):
+    headers = {"Content-Disposition": f'attachment; filename="{kind}.ndjson"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type="application/x-ndjson", headers=headers)
+
+
+def stream_export(kind: str, after_id: int = 0, gzip: bool = False):
+    """NDJSON export of one blog table for the sync router.
+
+    The response outlives the request's session dependency, so the
+    generator opens its own read-only session and closes it when done.
+    Resume a broken export with after_id set to the last id received.
+    """
+    statement = export_statement(kind, after_id)
+
+    def chunks():
+        compressor = zlib.compressobj(wbits=31) if gzip else None
+        with db_chooser.get_session_local("blog", readonly=True)() as session:
+            for partition in session.execute(statement).partitions():
+                data = ndjson(partition)
+                yield compressor.compress(data) if compressor else data
+        if compressor:
+            yield compressor.flush()
+
+    return export_response(chunks(), kind, gzip)
+
+
+def stream_export_async(kind: str, after_id: int = 0, gzip: bool = False):
+    """Same as stream_export, streaming through an AsyncSession."""
+    statement = export_statement(kind, after_id)
+
+    async def chunks():
+        compressor = zlib.compressobj(wbits=31) if gzip else None
+        async with db_chooser.get_async_session_local("blog", readonly=True)() as session:
+            result = await session.stream(statement)
+            async for partition in result.partitions():
+                data = ndjson(partition)
+                yield compressor.compress(data) if compressor else data
+        if compressor:
+            yield compressor.flush()
+
+    return export_response(chunks(), kind, gzip)
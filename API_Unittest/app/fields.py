@@ -0,0 +1,65 @@
+from typing import Dict, Optional
+from fastapi import HTTPException, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import load_only
+
+
+class Fieldset:
+    """A ?fields= parameter on a list route.
+
+    fields picks from the route's response schema, e.g. "id,title". The
+    picked columns become a load_only() option, so the others are never
+    read from SQLite, and render() returns just those keys instead of the
+    full response model. Relationship fields (nested maps them to their
+    schemas) are only loaded when picked. Without ?fields= nothing changes.
+    """
+    def __init__(self, model, schema, fields: Optional[str], nested: Dict[str, type] = None):
+        self.model = model
+        self.nested = nested or {}
+        self.selected = None
+        if fields is None:
+            return
+        allowed = list(schema.__fields__)
+        requested = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = set(requested) - set(allowed)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields {', '.join(sorted(unknown))}, choose from {', '.join(allowed)}"
+            )
+        # The id always comes back so rows can be told apart
+        self.selected = list(dict.fromkeys(["id", *requested]))
+
+    def options(self, *columns):
+        """load_only() for the picked columns plus any the query itself needs (sort keys)."""
+        if self.selected is None:
+            return []
+        picked = [getattr(self.model, name) for name in self.selected if name not in self.nested]
+        return [load_only(*picked, *columns)]
+
+    def expand(self, expand: Optional[str], default: str) -> Optional[str]:
+        """Drop ?expand= paths under relationships that were not picked."""
+        if self.selected is None:
+            return expand
+        paths = default if expand is None else expand
+        return ",".join(
+            path for path in paths.split(",") if path.strip() and path.strip().split(".")[0] in self.selected
+        )
+
+    def render(self, rows, response: Response):
+        if self.selected is None:
+            return rows
+        content = [
+            {name: self.value(row, name) for name in self.selected}
+            for row in rows
+        ]
+        # Keep what the handler already set on response (cursor headers, ETag)
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+        return JSONResponse(content, headers=headers)
+
+    def value(self, row, name):
+        value = getattr(row, name)
+        if name in self.nested:
+            # from_attributes as FastAPI does for response models, orm_mode alone is not enough on pydantic 2
+            return [self.nested[name].model_validate(item, from_attributes=True).model_dump() for item in value]
+        return value
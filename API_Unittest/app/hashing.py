@@ -0,0 +1,172 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from time import perf_counter
+from typing import List
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from app.metrics import metrics
+
+
+# bcrypt cost factor for new hashes; existing hashes verify at whatever cost they carry
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# One worker per core, plus this many hashes waiting per worker before 503s
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_QUEUE_PER_WORKER = int(os.getenv("HASH_QUEUE_PER_WORKER", "4"))
+HASH_RETRY_AFTER = 1
+# Seconds a batch (hash_many) waits for logins to free a slot before giving up with the 503
+HASH_BATCH_WAIT = float(os.getenv("HASH_BATCH_WAIT", "30"))
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+# Run in the worker processes, so they have to be plain module functions
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify(password: str, hashed: str) -> bool:
+    return pwd_context.verify(password, hashed)
+
+def _noop():
+    return None
+
+
+class HashingService:
+    """bcrypt in a process pool, so hashing does not hold the GIL.
+
+    At most workers * (1 + queue_per_worker) hashes are in flight; past that,
+    submit() raises a 503 with Retry-After instead of queueing without bound,
+    or first waits up to timeout seconds for a slot to free.
+    Request handlers await hash_async/verify_async and hold no thread while
+    they wait; the sync hash/verify/hash_many block their calling thread,
+    which suits the importer and the manage commands but not a request.
+    """
+    def __init__(self, workers: int = HASH_WORKERS, queue_per_worker: int = HASH_QUEUE_PER_WORKER):
+        self.workers = workers
+        self.capacity = workers * (1 + queue_per_worker)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slot_free = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._seconds_sum = 0.0
+        self._buckets = [0] * len(LATENCY_BUCKETS)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the parent has threads and open SQLite connections
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def submit(self, fn, *args, timeout: float = 0):
+        executor = self._get_executor()
+        with self._lock:
+            if not self._slot_free.wait_for(lambda: self._in_flight < self.capacity, timeout):
+                self._rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Too many password checks in progress, try again shortly",
+                    headers={"Retry-After": str(HASH_RETRY_AFTER)},
+                )
+            self._in_flight += 1
+        start = perf_counter()
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self._done(None)
+            raise
+        future.add_done_callback(lambda _: self._done(perf_counter() - start))
+        return future
+
+    def _done(self, seconds):
+        with self._lock:
+            self._in_flight -= 1
+            self._slot_free.notify()
+            if seconds is None:
+                return
+            self._completed += 1
+            self._seconds_sum += seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    self._buckets[i] += 1
+
+    def hash(self, password: str) -> str:
+        return self.submit(_hash, password).result()
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self.submit(_verify, password, hashed).result()
+
+    def hash_many(self, passwords: List[str]) -> List[str]:
+        """Hash a batch on every worker at once, results in input order.
+
+        Keeps two hashes per worker in flight, so the workers never wait on
+        this thread and the batch leaves room under capacity for logins.
+        When logins take that room anyway the batch waits for them, up to
+        HASH_BATCH_WAIT seconds per hash, rather than failing.
+        """
+        window = min(self.capacity, 2 * self.workers)
+        hashes = [None] * len(passwords)
+        pending = {}
+        for index, password in enumerate(passwords):
+            pending[self.submit(_hash, password, timeout=HASH_BATCH_WAIT)] = index
+            while len(pending) >= window:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    hashes[pending.pop(future)] = future.result()
+        for future, index in pending.items():
+            hashes[index] = future.result()
+        return hashes
+
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.wrap_future(self.submit(_hash, password))
+
+    async def verify_async(self, password: str, hashed: str) -> bool:
+        return await asyncio.wrap_future(self.submit(_verify, password, hashed))
+
+    def warm(self):
+        # Start every worker now rather than on the first logins
+        for future in [self._get_executor().submit(_noop) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def collect(self):
+        with self._lock:
+            in_flight, completed, rejected = self._in_flight, self._completed, self._rejected
+            seconds_sum, buckets = self._seconds_sum, list(self._buckets)
+        lines = [
+            "# HELP hash_pool_workers Password hashing worker processes",
+            "# TYPE hash_pool_workers gauge",
+            f"hash_pool_workers {self.workers}",
+            "# HELP hash_pool_in_flight Hashes queued or running",
+            "# TYPE hash_pool_in_flight gauge",
+            f"hash_pool_in_flight {in_flight}",
+            "# HELP hash_pool_queue_depth Hashes waiting for a free worker",
+            "# TYPE hash_pool_queue_depth gauge",
+            f"hash_pool_queue_depth {max(0, in_flight - self.workers)}",
+            "# HELP hash_pool_rejected_total Hashes refused with a 503 because the queue was full",
+            "# TYPE hash_pool_rejected_total counter",
+            f"hash_pool_rejected_total {rejected}",
+            "# HELP hash_seconds Time from submit to result, queueing included",
+            "# TYPE hash_seconds histogram",
+        ]
+        lines.extend(f'hash_seconds_bucket{{le="{bound}"}} {count}' for bound, count in zip(LATENCY_BUCKETS, buckets))
+        lines.append(f'hash_seconds_bucket{{le="+Inf"}} {completed}')
+        lines.append(f"hash_seconds_sum {seconds_sum}")
+        lines.append(f"hash_seconds_count {completed}")
+        return lines
+
+
+# Global instance
+hasher = HashingService()
+metrics.add_collector(hasher.collect)
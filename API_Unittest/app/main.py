@@ -1,43 +1,59 @@
-from fastapi import FastAPI
-from app.db import db_chooser, metadata
-from app import model
-from app.Router import auth, blog, library, task
-from app.Router.shop import products, categories, orders, customers
-
-
-app = FastAPI()
-
-# Initialize db
-def init_db():
-    # Initialize auth.db
-    auth_engine = db_chooser.get_engine('auth')
-    model.Base.metadata.create_all(bind=auth_engine)
-    #model.Base.metadata.drop_all(bind=engine)
-
-    # Initialize blog.db
-    blog_engine = db_chooser.get_engine('blog')
-    model.Base.metadata.create_all(bind=blog_engine)
-
-    # Initialize task.db
-    task_engine = db_chooser.get_engine('task')
-    model.Base.metadata.create_all(bind=task_engine)
-
-    # Initialize shop.db
-    shop_engine = db_chooser.get_engine('shop')
-    model.Base.metadata.create_all(bind=shop_engine)
-
-init_db()
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
+from fastapi.responses import PlainTextResponse
+from app.db import db_chooser
+from app.dependencies import REQUIRE_AUTH, get_caller, require_role
+from app.hashing import hasher
+from app.metrics import metrics
+from app.query_stats import QueryStatsMiddleware
+from app.roles import role_cache
+from app import schema
+from app.Router import admin, library
+
+if db_chooser.mode == "async":
+    from app.Router.aio import auth, blog, task
+    from app.Router.aio.shop import products, categories, orders, customers
+else:
+    from app.Router import auth, blog, task
+    from app.Router.shop import products, categories, orders, customers
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Set up each database's schema before the first request
+    schema.init_all()
+    role_cache.warm()
+    hasher.warm()
+    yield
+    # Close every pooled connection on shutdown
+    db_chooser.dispose()
+    await db_chooser.dispose_async()
+    hasher.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(QueryStatsMiddleware)
 
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(blog.router, prefix="/blog", tags=["blog"])
-app.include_router(task.router, prefix="/task", tags=["task"])
-app.include_router(products.router, prefix="/shop", tags=["shop"])
-app.include_router(orders.router, prefix="/shop", tags=["shop"])
-app.include_router(categories.router, prefix="/shop", tags=["shop"])
-app.include_router(customers.router, prefix="/shop", tags=["shop"])
+# Off by default, the task and shop clients don't send tokens yet;
+# bearer tokens and API keys are both accepted
+protected = [Depends(get_caller)] if REQUIRE_AUTH else []
+app.include_router(task.router, prefix="/task", tags=["task"], dependencies=protected)
+app.include_router(products.router, prefix="/shop", tags=["shop"], dependencies=protected)
+app.include_router(orders.router, prefix="/shop", tags=["shop"], dependencies=protected)
+app.include_router(categories.router, prefix="/shop", tags=["shop"], dependencies=protected)
+app.include_router(customers.router, prefix="/shop", tags=["shop"], dependencies=protected)
 app.include_router(library.router, prefix="/lib", tags=["lib"])
+# Database configuration, for admins only whatever REQUIRE_AUTH says
+app.include_router(admin.router, prefix="/admin", tags=["admin"], dependencies=[Depends(require_role("admin"))])
 
 
 @app.get("/")
 def home():
     return {"Home": "Update your awareness with us"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
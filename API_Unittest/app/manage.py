@@ -0,0 +1,148 @@
+"""Maintenance commands, run from the project root: python -m app.manage <command>"""
+import argparse
+import json
+import os
+from fastapi import HTTPException
+from app import schema, search
+from app.db import db_chooser
+from app.hashing import hasher
+from app.user_import import IMPORT_BATCH, UserImport, line_batches
+
+
+# Queries behind the relationship loads and per-parent filters, checked by "indexes"
+HOT_QUERIES = {
+    "auth": [
+        "SELECT * FROM users WHERE username = 'admin'",
+        "SELECT * FROM users WHERE username_lower = 'admin'",
+        "SELECT * FROM users WHERE username_lower >= 'ad' AND username_lower < 'ae' ORDER BY username_lower LIMIT 10",
+    ],
+    "blog": [
+        "SELECT * FROM posts WHERE author_id = 1",
+        "SELECT * FROM comments WHERE post_id = 1",
+    ],
+    "task": [
+        "SELECT * FROM tasks WHERE owner_id = 1",
+        "SELECT * FROM tasks WHERE owner_id = 1 AND completed = 0",
+    ],
+    "shop": [
+        "SELECT * FROM products WHERE category_id = 1",
+        "SELECT * FROM orders WHERE product_id = 1",
+        "SELECT * FROM orders WHERE customer_id = 1 ORDER BY id",
+    ],
+}
+
+
+def db_names(args):
+    names = args.db or db_chooser.db_names
+    unknown = set(names) - set(db_chooser.db_names)
+    if unknown:
+        raise SystemExit(f"unknown database: {', '.join(sorted(unknown))}")
+    return names
+
+
+def pragmas(args):
+    print(json.dumps({name: db_chooser.read_pragmas(name) for name in db_names(args)}, indent=2))
+
+
+def explain(engine, sql):
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+    return "; ".join(row[-1] for row in rows)
+
+
+def indexes(args):
+    for name in db_names(args):
+        engine = db_chooser.get_engine(name)
+        before = {sql: explain(engine, sql) for sql in HOT_QUERIES[name]}
+        missing = []
+        for index in schema.missing_indexes(name, engine):
+            collisions = schema.index_collisions(index, engine)
+            if not collisions:
+                missing.append(index.name)
+                continue
+            # Reported before anything is built, create_missing_indexes skips it
+            print(f"{name}: cannot build unique {index.name}, fix these duplicates first:")
+            for *values, count in collisions:
+                print(f"  {', '.join(map(repr, values))}: {count} rows")
+        if args.dry_run:
+            print(f"{name}: would create {', '.join(missing) or 'nothing'}")
+            created = []
+        else:
+            created = schema.create_missing_indexes(name, engine)
+            print(f"{name}: created {', '.join(created) or 'nothing'}")
+            # Pooled connections keep statements prepared against the old schema,
+            # the after plans need fresh ones to see the new indexes
+            engine.dispose()
+        for sql, plan in before.items():
+            print(f"  {sql}")
+            print(f"    before: {plan}")
+            if created:
+                print(f"    after:  {explain(engine, sql)}")
+
+
+def fts_rebuild(args):
+    # init_fts creates and fills the index if it is missing, rebuild refills it from the tables
+    engine = db_chooser.get_engine("blog")
+    with engine.begin() as conn:
+        search.init_fts(conn)
+        for table in search.FTS_TABLES:
+            search.rebuild_fts(conn, table)
+            count = conn.exec_driver_sql(f"SELECT count(*) FROM {table}").scalar()
+            print(f"{table}: indexed {count} rows")
+
+
+def import_users(args):
+    extension = os.path.splitext(args.file)[1].lstrip(".").lower()
+    fmt = args.format or {"jsonl": "ndjson"}.get(extension, extension)
+    schema.init_db("auth")
+    try:
+        importer = UserImport(fmt, args.role)
+    except HTTPException as e:
+        raise SystemExit(e.detail)
+    try:
+        with open(args.file, encoding="utf-8", newline="") as lines:
+            for batch in line_batches(lines, args.batch):
+                importer.feed(batch)
+                report = importer.report()
+                print(f"{report['rows']} rows: {report['created']} created, {report['failed']} failed, {report['rows_per_sec']} rows/sec")
+    except HTTPException as e:
+        # Batches before the error are in
+        print(json.dumps(importer.report(aborted=e.detail), indent=2))
+        raise SystemExit(e.detail)
+    finally:
+        hasher.shutdown()
+    print(json.dumps(importer.report(), indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("pragmas", help="show the SQLite settings in effect")
+    cmd.add_argument("db", nargs="*", help="databases to report, all by default")
+    cmd.set_defaults(func=pragmas)
+
+    cmd = commands.add_parser("indexes", help="add missing indexes to existing database files")
+    cmd.add_argument("db", nargs="*", help="databases to migrate, all by default")
+    cmd.add_argument("--dry-run", action="store_true", help="only report what is missing")
+    cmd.set_defaults(func=indexes)
+
+    cmd = commands.add_parser("fts-rebuild", help="backfill the blog full-text search index")
+    cmd.set_defaults(func=fts_rebuild)
+
+    cmd = commands.add_parser("import-users", help="create users from a CSV or NDJSON file")
+    cmd.add_argument("file", help="one user per line; CSV needs a username,firstname,lastname,passwd header")
+    cmd.add_argument("--format", choices=("csv", "ndjson"), help="taken from the file extension by default")
+    cmd.add_argument("--role", default="user", help="role given to every imported user")
+    cmd.add_argument("--batch", type=int, default=IMPORT_BATCH, help="rows per transaction")
+    cmd.set_defaults(func=import_users)
+
+    args = parser.parse_args(argv)
+    try:
+        args.func(args)
+    finally:
+        db_chooser.dispose()
+
+
+if __name__ == "__main__":
+    main()
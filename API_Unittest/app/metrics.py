@@ -0,0 +1,133 @@
+import threading
+from collections import defaultdict
+from time import perf_counter
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class TimedPoolMixin:
+    """Stamp each checkout with the time spent waiting for a connection.
+
+    The "checkout" pool event fires right after _do_get() and reads the
+    stamp back, so the timing survives pool.recreate() along with the events.
+    """
+    def _do_get(self):
+        start = perf_counter()
+        record = super()._do_get()
+        record.info["checkout_wait"] = perf_counter() - start
+        return record
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class PoolStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.checkout_wait_sum = 0.0
+        self.connections_opened = 0
+        self.connections_closed = 0
+        self.queries = 0
+        self.commits = 0
+        self.commit_seconds_sum = 0.0
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # keyed by (db_name, "rw" | "ro")
+        self._stats = defaultdict(PoolStats)
+        self._engines = {}
+        self._collectors = []
+
+    def _record(self, key, **amounts):
+        with self._lock:
+            stats = self._stats[key]
+            for name, amount in amounts.items():
+                setattr(stats, name, getattr(stats, name) + amount)
+
+    def instrument_engine(self, engine, db_name, readonly=False):
+        key = (db_name, "ro" if readonly else "rw")
+        self._engines[key] = engine
+
+        @event.listens_for(engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            self._record(key, connections_opened=1)
+
+        @event.listens_for(engine, "close")
+        def on_close(dbapi_connection, connection_record):
+            self._record(key, connections_closed=1)
+
+        @event.listens_for(engine, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            wait = connection_record.info.pop("checkout_wait", 0.0)
+            self._record(key, checkouts=1, checkout_wait_sum=wait)
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def on_execute(conn, cursor, statement, parameters, context, executemany):
+            self._record(key, queries=1)
+
+        return engine
+
+    def instrument_sessions(self, target, db_name, readonly=False):
+        """Time commits (flush included) on a sessionmaker or Session class."""
+        key = (db_name, "ro" if readonly else "rw")
+
+        @event.listens_for(target, "before_commit")
+        def on_before_commit(session):
+            session.info["commit_start"] = perf_counter()
+
+        @event.listens_for(target, "after_commit")
+        def on_after_commit(session):
+            start = session.info.pop("commit_start", None)
+            if start is not None:
+                self._record(key, commits=1, commit_seconds_sum=perf_counter() - start)
+
+        return target
+
+    def add_collector(self, collector):
+        """Register collector() -> iterable of extra Prometheus text lines."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            stats = {key: vars(value).copy() for key, value in self._stats.items()}
+
+        lines = []
+        def family(name, kind, help_text, values):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (db_name, pool), value in sorted(values.items()):
+                lines.append(f'{name}{{db="{db_name}",pool="{pool}"}} {value}')
+
+        def counter(field):
+            return {key: value[field] for key, value in stats.items()}
+
+        family("db_pool_checkouts_total", "counter", "Connections checked out of the pool", counter("checkouts"))
+        family("db_pool_checkout_wait_seconds_sum", "counter", "Time spent waiting for a pooled connection", counter("checkout_wait_sum"))
+        family("db_connections_opened_total", "counter", "New DBAPI connections opened", counter("connections_opened"))
+        family("db_connections_closed_total", "counter", "DBAPI connections closed", counter("connections_closed"))
+        family("db_queries_total", "counter", "SQL statements executed", counter("queries"))
+        family("db_commits_total", "counter", "Session commits", counter("commits"))
+        family("db_commit_seconds_sum", "counter", "Time spent in session commits, flush included", counter("commit_seconds_sum"))
+
+        pools = {key: engine.pool for key, engine in self._engines.items()}
+        family("db_pool_size", "gauge", "Configured pool size",
+               {key: pool.size() for key, pool in pools.items() if hasattr(pool, "overflow")})
+        family("db_pool_checked_out", "gauge", "Connections currently checked out",
+               {key: pool.checkedout() for key, pool in pools.items() if hasattr(pool, "overflow")})
+        family("db_pool_overflow", "gauge", "Connections open beyond pool_size",
+               {key: max(pool.overflow(), 0) for key, pool in pools.items() if hasattr(pool, "overflow")})
+
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+# Global instance
+metrics = Metrics()
@@ -1,21 +1,30 @@
-from sqlalchemy import Table, Column, Integer, String, Boolean, ForeignKey, Text, Float
+from datetime import datetime
+from sqlalchemy import Table, Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, Index, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from .db import metadata
 
 Base = declarative_base()
 
+
+# Every table records the database it lives in through info["db"]
+def tables_for(db_name: str):
+    return [table for table in Base.metadata.sorted_tables if table.info.get("db") == db_name]
+
+
 """Task 3"""
 user_roles = Table(
     "user_roles",
     Base.metadata,
     Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
-    Column("role_id", Integer, ForeignKey("roles.id"), primary_key=True)
+    Column("role_id", Integer, ForeignKey("roles.id"), primary_key=True),
+    info={"db": "auth"}
 )
 
 
 class Roles(Base):
     __tablename__ = "roles"
+    __table_args__ = {"info": {"db": "auth"}}
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, unique=True)
@@ -25,9 +34,13 @@ class Roles(Base):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = {"info": {"db": "auth"}}
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     username = Column(String, unique=True)
+    # Case-insensitive lookups and prefix search go through this index, which
+    # also keeps "Alice" and "alice" from both being taken
+    username_lower = Column(String, index=True, unique=True)
     firstname = Column(String)
     lastname = Column(String)
     hashed_pwd = Column(String)
@@ -36,8 +49,31 @@ class User(Base):
     roles = relationship("Roles", secondary=user_roles, back_populates="users")
     tasks = relationship("Task", back_populates="owner")
 
+    @validates("username")
+    def set_username_lower(self, key, username):
+        # Core inserts bypass this and set username_lower themselves
+        self.username_lower = username.lower() if username is not None else None
+        return username
+
+class ApiKey(Base):
+    __tablename__ = "api_keys"
+    __table_args__ = {"info": {"db": "auth"}}
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    name = Column(String)
+    # Start of the key so its owner can tell keys apart; the key itself is never stored
+    prefix = Column(String)
+    # HMAC-SHA256 of the key, what an X-API-Key header is looked up by
+    key_hash = Column(String, unique=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    revoked_at = Column(DateTime)
+
+    user = relationship("User")
+
 class Author(Base):
     __tablename__ = "authors"
+    __table_args__ = {"info": {"db": "blog"}}
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, unique=True)
@@ -49,28 +85,47 @@ class Author(Base):
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = {"info": {"db": "blog"}}
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     title = Column(String)
     content = Column(Text)
-    author_id = Column(Integer, ForeignKey("authors.id"))
+    author_id = Column(Integer, ForeignKey("authors.id"), index=True)
+    # Bumped by triggers on every change to the post or its comments, see app/etag.py
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
 
     author = relationship("Author", back_populates="posts")
     comments = relationship("Comment", back_populates="post")
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = {"info": {"db": "blog"}}
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     content = Column(Text)
-    post_id = Column(Integer, ForeignKey("posts.id"))
+    post_id = Column(Integer, ForeignKey("posts.id"), index=True)
     
     post = relationship("Post", back_populates="comments")
 
 
+# One version per cached collection, e.g. "posts" for every list page of posts
+collection_versions = Table(
+    "collection_versions",
+    Base.metadata,
+    Column("name", String, primary_key=True),
+    Column("version", Integer, nullable=False, default=1),
+    info={"db": "blog"}
+)
+
+
 """Task 4"""
 class Task(Base):
     __tablename__ = "tasks"
+    # Also serves lookups on owner_id alone
+    __table_args__ = (
+        Index("ix_tasks_owner_id_completed", "owner_id", "completed"),
+        {"info": {"db": "task"}},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     title = Column(String)
@@ -84,6 +139,7 @@ class Task(Base):
 """Task 2"""
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = {"info": {"db": "shop"}}
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, unique=True)
@@ -92,18 +148,20 @@ class Category(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = {"info": {"db": "shop"}}
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String)
     description = Column(String)
     price = Column(Float)
-    category_id = Column(Integer, ForeignKey("categories.id"))
+    category_id = Column(Integer, ForeignKey("categories.id"), index=True)
 
     category = relationship("Category", back_populates="products")
     orders = relationship("Order", back_populates="product")
 
 class Customer(Base):
     __tablename__ = "customers"
+    __table_args__ = {"info": {"db": "shop"}}
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String)
@@ -113,10 +171,12 @@ class Customer(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = {"info": {"db": "shop"}}
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    product_id = Column(Integer, ForeignKey("products.id"))
-    customer_id = Column(Integer, ForeignKey("customers.id"))
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
+    # SQLite appends the rowid to every index entry, so this is (customer_id, id)
+    customer_id = Column(Integer, ForeignKey("customers.id"), index=True)
     quantity = Column(Integer)
 
     product = relationship("Product", back_populates="orders")
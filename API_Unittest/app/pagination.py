@@ -0,0 +1,118 @@
+import base64
+import binascii
+import json
+from typing import Optional, Sequence
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import and_, or_, tuple_
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+PREV_CURSOR_HEADER = "X-Prev-Cursor"
+
+
+def encode_cursor(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(payload, dict) or not isinstance(payload.get("k"), list) or payload.get("d") not in ("next", "prev"):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Key values are bound as SQL parameters, anything but a scalar is forged
+    if not all(value is None or isinstance(value, (str, int, float, bool)) for value in payload["k"]):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return payload
+
+
+class KeysetPage:
+    """Keyset (cursor) pagination over model, ordered by sort then primary key.
+
+    apply() adds the ordering, the keyset filter and the limit to a Query or
+    select(); finish() takes the rows it returned, trims the look-ahead row and
+    puts the next/prev cursors in the response headers (plus a Link header).
+    Without a cursor the old skip offset still applies, so offset clients keep
+    working and also get a next cursor to switch over with.
+
+    A sort column may hold NULLs: they sort before every value, as SQLite
+    orders them, and the seek steps over them explicitly, since a row-value
+    comparison with a NULL in it matches nothing.
+    """
+    def __init__(self, model, sort: Optional[str], cursor: Optional[str], limit: int,
+                 skip: int = 0, sort_columns: Sequence[str] = ("id",)):
+        sort = sort or "id"
+        name = sort.lstrip("-")
+        if name not in sort_columns:
+            raise HTTPException(status_code=400, detail=f"Cannot sort by {name}, choose from {', '.join(sort_columns)}")
+        self.model = model
+        self.sort = sort
+        self.descending = sort.startswith("-")
+        self.columns = [getattr(model, name)] if name == "id" else [getattr(model, name), model.id]
+        self.limit = limit
+        self.skip = skip
+        self.cursor = decode_cursor(cursor) if cursor else None
+        if self.cursor and self.cursor.get("s", "id") != sort:
+            raise HTTPException(status_code=400, detail="Cursor was issued for a different sort")
+        if self.cursor and len(self.cursor["k"]) != len(self.columns):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    @property
+    def backwards(self):
+        return self.cursor is not None and self.cursor["d"] == "prev"
+
+    def apply(self, query):
+        # Walking backwards flips the order; finish() flips the rows back
+        descending = self.descending != self.backwards
+        if self.cursor:
+            query = query.filter(self.seek(descending))
+        order = [column.desc() if descending else column.asc() for column in self.columns]
+        query = query.order_by(*order)
+        if self.skip and not self.cursor:
+            query = query.offset(self.skip)
+        # One extra row tells whether there is another page
+        return query.limit(self.limit + 1)
+
+    def seek(self, descending: bool):
+        """The rows after the cursor in this order."""
+        if len(self.columns) == 1:
+            # The primary key alone, never NULL
+            return self.columns[0] < self.cursor["k"][0] if descending else self.columns[0] > self.cursor["k"][0]
+        column, id = self.columns
+        value, after_id = self.cursor["k"]
+        if value is None:
+            nulls = and_(column.is_(None), id < after_id if descending else id > after_id)
+            # Every value comes after the NULLs going up, none of them going down
+            return nulls if descending else or_(nulls, column.is_not(None))
+        key, values = tuple_(column, id), tuple_(value, after_id)
+        return or_(key < values, column.is_(None)) if descending else key > values
+
+    def key(self, row):
+        return [getattr(row, column.key) for column in self.columns]
+
+    def finish(self, rows, request: Request, response: Response):
+        rows = list(rows)
+        more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if self.backwards:
+            rows.reverse()
+
+        next_cursor = prev_cursor = None
+        if rows:
+            if more or self.backwards:
+                next_cursor = encode_cursor({"k": self.key(rows[-1]), "d": "next", "s": self.sort})
+            if (more and self.backwards) or (self.cursor and not self.backwards) or (not self.cursor and self.skip):
+                prev_cursor = encode_cursor({"k": self.key(rows[0]), "d": "prev", "s": self.sort})
+
+        links = []
+        for rel, value, header in (("next", next_cursor, NEXT_CURSOR_HEADER), ("prev", prev_cursor, PREV_CURSOR_HEADER)):
+            if value:
+                response.headers[header] = value
+                url = request.url.remove_query_params("skip").include_query_params(cursor=value)
+                links.append(f'<{url}>; rel="{rel}"')
+        if links:
+            response.headers["Link"] = ", ".join(links)
+        return rows
@@ -0,0 +1,71 @@
+import logging
+from contextvars import ContextVar
+from time import perf_counter
+from sqlalchemy import event
+
+
+logger = logging.getLogger("app.sql")
+
+QUERY_COUNT_HEADER = "x-db-query-count"
+
+_current = ContextVar("query_stats", default=None)
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.seconds * 1000:.2f};desc="{self.count} queries"'
+
+
+def instrument_engine(engine):
+    """Count statements and their time against the current request, if any."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += perf_counter() - start
+
+    return engine
+
+
+class QueryStatsMiddleware:
+    """Report each request's SQL statements as headers and a log line.
+
+    The stats object is set before the app runs, so the copy of the
+    context that sync handlers get in the threadpool still points at it.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        token = _current.set(stats)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode()))
+                headers.append((QUERY_COUNT_HEADER.encode(), str(stats.count).encode()))
+                message = {**message, "headers": headers}
+                logger.info(
+                    "%s %s queries=%d db_ms=%.2f", scope["method"], scope["path"], stats.count, stats.seconds * 1000,
+                    extra={"db_queries": stats.count, "db_ms": stats.seconds * 1000},
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current.reset(token)
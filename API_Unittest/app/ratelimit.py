@@ -0,0 +1,148 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from app.cache import LRUCache
+from app.metrics import metrics
+
+
+# Per client IP and per username token buckets for the routes that hash
+# unauthenticated input: a full bucket of BURST, refilled at PER_MINUTE
+RATE_LIMIT_IP_BURST = int(os.getenv("RATE_LIMIT_IP_BURST", "300"))
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "120"))
+RATE_LIMIT_USER_BURST = int(os.getenv("RATE_LIMIT_USER_BURST", "10"))
+RATE_LIMIT_USER_PER_MINUTE = float(os.getenv("RATE_LIMIT_USER_PER_MINUTE", "6"))
+# Buckets kept in memory; idle ones drop out once refilled, the least recently used past this
+RATE_LIMIT_KEYS = int(os.getenv("RATE_LIMIT_KEYS", "100000"))
+# SQLite file shared by every worker process on the host; in-process buckets when unset
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB")
+
+
+def take_token(state, burst: int, per_second: float, now: float):
+    """Refill a (tokens, updated) bucket up to now and take one token from it.
+
+    Returns (seconds until a token is free, 0 when one was taken; new state).
+    A missing state is a full bucket.
+    """
+    tokens, updated = state or (burst, now)
+    tokens = min(burst, tokens + (now - updated) * per_second)
+    if tokens < 1:
+        return (1 - tokens) / per_second, (tokens, now)
+    return 0, (tokens - 1, now)
+
+
+def full_at(state, burst: int, per_second: float) -> float:
+    """When the bucket is full again, after which forgetting it changes nothing."""
+    tokens, updated = state
+    return updated + (burst - tokens) / per_second
+
+
+class MemoryBackend:
+    """Buckets in this process, in an LRU bounded to maxsize keys."""
+    def __init__(self, maxsize: int = RATE_LIMIT_KEYS):
+        self.buckets = LRUCache(maxsize)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, burst: int, per_second: float) -> float:
+        with self._lock:
+            wait, state = take_token(self.buckets.get(key), burst, per_second, time.time())
+            self.buckets.set(key, state, expires_at=full_at(state, burst, per_second))
+        return wait
+
+
+class SQLiteBackend:
+    """Buckets in a SQLite file, so every worker process draws from the same ones.
+
+    Each take is one short IMMEDIATE transaction; buckets that have refilled
+    are deleted as it goes, so the table only holds recently limited keys.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_buckets_full_at ON rate_buckets (full_at)")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, burst: int, per_second: float) -> float:
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+            wait, state = take_token(state, burst, per_second, now)
+            conn.execute(
+                "INSERT INTO rate_buckets VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE "
+                "SET tokens = excluded.tokens, updated = excluded.updated, full_at = excluded.full_at",
+                (key, *state, full_at(state, burst, per_second)),
+            )
+            conn.execute("DELETE FROM rate_buckets WHERE full_at < ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+class AuthLimiter:
+    """Throttle login and registration before they spend any bcrypt time.
+
+    check() takes a token from the client IP's bucket, then from the
+    username's, and raises a 429 with Retry-After when either is empty.
+    The IP is the socket peer; behind a proxy every client shares its
+    address, so raise the IP limits there.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._limited = {"ip": 0, "username": 0}
+
+    def check(self, request: Request, username: str = None):
+        host = request.client.host if request.client else "unknown"
+        buckets = [("ip", f"ip:{host}", RATE_LIMIT_IP_BURST, RATE_LIMIT_IP_PER_MINUTE)]
+        if username:
+            buckets.append(("username", f"user:{username.lower()}", RATE_LIMIT_USER_BURST, RATE_LIMIT_USER_PER_MINUTE))
+        for bucket, key, burst, per_minute in buckets:
+            wait = self.backend.take(key, burst, per_minute / 60)
+            if wait:
+                with self._lock:
+                    self._limited[bucket] += 1
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many attempts, try again later",
+                    headers={"Retry-After": str(math.ceil(wait))},
+                )
+
+    async def check_async(self, request: Request, username: str = None):
+        """check() for async routes; a SQLite backend can wait on the file lock, so it runs in a thread."""
+        if isinstance(self.backend, MemoryBackend):
+            self.check(request, username)
+        else:
+            await run_in_threadpool(self.check, request, username)
+
+    def collect(self):
+        with self._lock:
+            limited = dict(self._limited)
+        lines = [
+            "# HELP auth_rate_limited_total Login and registration attempts refused with a 429",
+            "# TYPE auth_rate_limited_total counter",
+        ]
+        lines.extend(f'auth_rate_limited_total{{bucket="{bucket}"}} {count}' for bucket, count in limited.items())
+        return lines
+
+
+# Global instance
+auth_limiter = AuthLimiter(SQLiteBackend(RATE_LIMIT_DB) if RATE_LIMIT_DB else MemoryBackend())
+metrics.add_collector(auth_limiter.collect)
@@ -0,0 +1,99 @@
+import os
+import threading
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from app import model
+from app.db import db_chooser
+
+
+def database(db):
+    """The file a Session or AsyncSession writes to, or its engine for an in-memory database."""
+    bind = db.get_bind()
+    if bind.url.database in (None, "", ":memory:"):
+        # Every in-memory engine is a database of its own
+        return bind
+    return os.path.abspath(bind.url.database)
+
+
+class RoleCache:
+    """Role name -> id, so registration can write user_roles without reading roles.
+
+    Roles are a handful of rows that are added, never renamed, so the map
+    only grows. A name is cached once the transaction that created or
+    looked it up commits; a rolled back role never gets in. Ids are kept
+    per database, as tests point the auth database elsewhere.
+    """
+    def __init__(self):
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def warm(self):
+        """Load every role, called at startup."""
+        with db_chooser.get_session_local("auth")() as db:
+            rows = db.execute(select(model.Roles.name, model.Roles.id)).all()
+            self.add({(database(db), name): role_id for name, role_id in rows})
+
+    def get(self, db, name: str):
+        return self._ids.get((database(db), name))
+
+    def role_id(self, db: Session, name: str) -> int:
+        """The role's id, creating it in db's transaction on first use."""
+        role_id = self.get(db, name)
+        if role_id is None:
+            db.execute(self._create(name))
+            role_id = db.scalar(self._lookup(name))
+            self._remember(db, name, role_id)
+        return role_id
+
+    async def role_id_async(self, db, name: str) -> int:
+        role_id = self.get(db, name)
+        if role_id is None:
+            await db.execute(self._create(name))
+            role_id = await db.scalar(self._lookup(name))
+            self._remember(db, name, role_id)
+        return role_id
+
+    @staticmethod
+    def _create(name: str):
+        # Two first registrations racing for a new role both end up with the same row
+        return insert(model.Roles).values(name=name).on_conflict_do_nothing(index_elements=["name"])
+
+    @staticmethod
+    def _lookup(name: str):
+        return select(model.Roles.id).where(model.Roles.name == name)
+
+    @staticmethod
+    def _remember(db, name: str, role_id: int):
+        # AsyncSession.info is its sync session's info
+        db.info.setdefault("new_roles", {})[(database(db), name)] = role_id
+
+    def add(self, roles: dict):
+        with self._lock:
+            self._ids.update(roles)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+
+# Global instance
+role_cache = RoleCache()
+
+
+# Roles added through the ORM are picked up too
+@event.listens_for(Session, "after_flush")
+def _collect_new_roles(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, model.Roles):
+            session.info.setdefault("new_roles", {})[(database(session), obj.name)] = obj.id
+
+@event.listens_for(Session, "after_commit")
+def _cache_new_roles(session):
+    roles = session.info.pop("new_roles", None)
+    if roles:
+        role_cache.add(roles)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_new_roles(session, previous_transaction):
+    session.info.pop("new_roles", None)
@@ -0,0 +1,123 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+from app import etag, model, search
+from app.db import db_chooser
+
+
+def backfill_username_lower(conn):
+    # Rows from before users.username_lower, or written by raw SQL. Lowered
+    # in Python rather than by SQLite's lower(), which only folds ASCII.
+    rows = conn.execute(text("SELECT id, username FROM users WHERE username_lower IS NULL AND username IS NOT NULL")).all()
+    if rows:
+        conn.execute(
+            text("UPDATE users SET username_lower = :lower WHERE id = :id"),
+            [{"id": id, "lower": username.lower()} for id, username in rows],
+        )
+
+
+# Schema objects metadata cannot express (virtual tables, triggers) and
+# data fixes for new columns, per database
+EXTRA_DDL = {"auth": [backfill_username_lower], "blog": [search.init_fts, etag.init_versions]}
+
+
+def init_db(db_name: str, engine=None):
+    """Create the tables that belong to db_name, skipping the ones already there."""
+    engine = engine or db_chooser.get_engine(db_name)
+    existing = set(inspect(engine).get_table_names())
+    missing = [table for table in model.tables_for(db_name) if table.name not in existing]
+    if missing:
+        model.Base.metadata.create_all(bind=engine, tables=missing)
+    add_missing_columns(db_name, engine)
+    if db_name in EXTRA_DDL:
+        with engine.begin() as conn:
+            for init in EXTRA_DDL[db_name]:
+                init(conn)
+    return [table.name for table in missing]
+
+
+def missing_columns(db_name: str, engine):
+    """Columns declared in model.py that an existing table does not have yet."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in model.tables_for(db_name):
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        missing.extend(column for column in table.columns if column.name not in present)
+    return missing
+
+
+def add_missing_columns(db_name: str, engine=None):
+    # ADD COLUMN only touches the schema in SQLite, existing rows read the
+    # default, so unlike indexes this is cheap enough to run at startup.
+    # NOT NULL columns need a server_default for it to work.
+    engine = engine or db_chooser.get_engine(db_name)
+    added = []
+    with engine.begin() as conn:
+        for column in missing_columns(db_name, engine):
+            ddl = CreateColumn(column).compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE {column.table.name} ADD COLUMN {ddl}"))
+            added.append(f"{column.table.name}.{column.name}")
+    return added
+
+
+def missing_indexes(db_name: str, engine):
+    """Indexes declared in model.py that an existing table does not have yet,
+    or has under the same name without the unique constraint.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in model.tables_for(db_name):
+        if table.name not in existing_tables:
+            continue
+        present = {index["name"]: index["unique"] for index in inspector.get_indexes(table.name)}
+        missing.extend(
+            index for index in table.indexes
+            if index.name not in present or (index.unique and not present[index.name])
+        )
+    return missing
+
+
+def index_collisions(index, engine, limit: int = 20):
+    """Values more than one row holds, which keep a unique index from being built.
+
+    (values..., row count) for at most limit of them; rows with a NULL in
+    the index are left out, as a unique index lets those repeat.
+    """
+    if not index.unique:
+        return []
+    columns = ", ".join(column.name for column in index.columns)
+    not_null = " AND ".join(f"{column.name} IS NOT NULL" for column in index.columns)
+    with engine.connect() as conn:
+        return conn.execute(text(
+            f"SELECT {columns}, count(*) FROM {index.table.name} WHERE {not_null} "
+            f"GROUP BY {columns} HAVING count(*) > 1 LIMIT {int(limit)}"
+        )).all()
+
+
+def create_missing_indexes(db_name: str, engine=None):
+    # CREATE INDEX builds next to the table, the table itself is not rewritten.
+    # A unique index with collisions is skipped, index_collisions lists them.
+    engine = engine or db_chooser.get_engine(db_name)
+    created = []
+    for index in missing_indexes(db_name, engine):
+        if index_collisions(index, engine):
+            continue
+        with engine.begin() as conn:
+            # An older non-unique index of the same name is replaced in the same transaction
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+            index.create(bind=conn)
+        created.append(index.name)
+    return created
+
+
+def init_all():
+    # Creating each writer engine runs init_db through the initializer hook
+    for db_name in db_chooser.db_names:
+        db_chooser.get_engine(db_name)
+
+
+# Any engine created later (tests, CLI, first request) gets its schema too
+db_chooser.add_initializer(init_db)
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from datetime import datetime
 from typing import List, Optional
 
 """Task 3"""
@@ -20,6 +21,46 @@ class User(UserBase):
         orm_mode=True
 
 
+class CurrentUser(User):
+    roles: List[str] = []
+
+
+class ImportFailure(BaseModel):
+    line: int
+    username: Optional[str]
+    error: str
+
+
+class ImportReport(BaseModel):
+    # Why the import stopped early, None when it ran to the end
+    aborted: Optional[str] = None
+    rows: int
+    created: int
+    failed: int
+    errors: List[ImportFailure]
+    seconds: float
+    rows_per_sec: float
+
+
+class ApiKeyCreate(BaseModel):
+    name: str
+
+
+class ApiKey(ApiKeyCreate):
+    id: int
+    prefix: str
+    created_at: datetime
+    revoked_at: Optional[datetime]
+
+    class Config:
+        orm_mode=True
+
+
+class ApiKeyCreated(ApiKey):
+    # Only returned once, at creation
+    key: str
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -52,6 +93,37 @@ class Post(PostBase):
         orm_mode = True
 
 
+class PostSummary(BaseModel):
+    id: int
+    title: str
+    author_id: int
+    comment_count: int
+    last_comment_id: Optional[int]
+
+    class Config:
+        orm_mode = True
+
+
+class PostBulkItem(PostBase):
+    author_id: int
+
+
+class CommentBulkItem(CommentBase):
+    post_id: int
+
+
+class BulkCreated(BaseModel):
+    ids: List[int]
+
+
+class SearchHit(BaseModel):
+    post_id: int
+    comment_id: Optional[int]
+    title: Optional[str]
+    snippet: str
+    rank: float
+
+
 class AuthorBase(BaseModel):
     name: str
 
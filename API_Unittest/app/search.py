@@ -0,0 +1,122 @@
+from typing import Optional
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import text
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+
+# External-content FTS5 indexes over blog.db; triggers keep them in step with
+# every write path (ORM, bulk inserts, the async routers, raw SQL).
+FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(title, content, content='posts', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF title, content ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5(content, content='comments', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS comments_fts_ai AFTER INSERT ON comments BEGIN
+        INSERT INTO comments_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comments_fts_ad AFTER DELETE ON comments BEGIN
+        INSERT INTO comments_fts(comments_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comments_fts_au AFTER UPDATE OF content ON comments BEGIN
+        INSERT INTO comments_fts(comments_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO comments_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+]
+
+FTS_TABLES = ("posts_fts", "comments_fts")
+
+# bm25 weights: a hit in the title counts ten times a hit in the body
+SEARCH_SQL = {
+    "posts": """
+        SELECT * FROM (
+            SELECT posts.id AS post_id, NULL AS comment_id, posts.title AS title,
+                   snippet(posts_fts, -1, '[', ']', '...', 12) AS snippet,
+                   bm25(posts_fts, 10.0, 1.0) AS rank, posts.id AS id
+            FROM posts_fts JOIN posts ON posts.id = posts_fts.rowid
+            WHERE posts_fts MATCH :query
+        )
+    """,
+    "comments": """
+        SELECT * FROM (
+            SELECT comments.post_id AS post_id, comments.id AS comment_id, NULL AS title,
+                   snippet(comments_fts, 0, '[', ']', '...', 12) AS snippet,
+                   bm25(comments_fts) AS rank, comments.id AS id
+            FROM comments_fts JOIN comments ON comments.id = comments_fts.rowid
+            WHERE comments_fts MATCH :query
+        )
+    """,
+}
+
+
+def init_fts(conn):
+    """Create the FTS tables and triggers; backfill them if they were just created."""
+    existing = {row[0] for row in conn.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('posts_fts', 'comments_fts')"))}
+    for statement in FTS_DDL:
+        conn.execute(text(statement))
+    for table in FTS_TABLES:
+        if table not in existing:
+            rebuild_fts(conn, table)
+
+
+def rebuild_fts(conn, table: str):
+    conn.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+
+
+def match_query(q: str) -> str:
+    # Quote every term so user input can't hit FTS5 query syntax; terms are ANDed
+    terms = [term.replace('"', '""') for term in q.split()]
+    if not terms:
+        raise HTTPException(status_code=400, detail="Empty search query")
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def valid_search_key(key) -> bool:
+    """A search cursor's key is [rank, id]: a number and an integer, never a bool."""
+    if len(key) != 2 or any(isinstance(value, bool) for value in key):
+        return False
+    rank, id = key
+    return isinstance(rank, (int, float)) and isinstance(id, int)
+
+
+class SearchPage:
+    """Ranked FTS5 search with a (rank, id) cursor, best matches first."""
+
+    def __init__(self, q: str, scope: str, cursor: Optional[str], limit: int):
+        if scope not in SEARCH_SQL:
+            raise HTTPException(status_code=400, detail=f"Cannot search {scope}, choose from {', '.join(SEARCH_SQL)}")
+        self.scope = scope
+        self.limit = limit
+        self.params = {"query": match_query(q), "limit": limit + 1}
+        self.cursor = decode_cursor(cursor) if cursor else None
+        if self.cursor and (self.cursor.get("s") != f"search:{scope}" or not valid_search_key(self.cursor["k"])):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    def statement(self):
+        sql = SEARCH_SQL[self.scope]
+        if self.cursor:
+            sql += " WHERE (rank, id) > (:after_rank, :after_id)"
+            self.params["after_rank"], self.params["after_id"] = self.cursor["k"]
+        return text(sql + " ORDER BY rank, id LIMIT :limit")
+
+    def finish(self, rows, request: Request, response: Response):
+        rows = list(rows)
+        more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if more:
+            last = rows[-1]
+            cursor = encode_cursor({"k": [last.rank, last.id], "d": "next", "s": f"search:{self.scope}"})
+            response.headers[NEXT_CURSOR_HEADER] = cursor
+            response.headers["Link"] = f'<{request.url.include_query_params(cursor=cursor)}>; rel="next"'
+        return [
+            {"post_id": row.post_id, "comment_id": row.comment_id, "title": row.title, "snippet": row.snippet, "rank": row.rank}
+            for row in rows
+        ]
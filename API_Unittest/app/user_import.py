@@ -0,0 +1,206 @@
+import csv
+import json
+import os
+from time import perf_counter
+from typing import Iterable, List
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import model, schemas
+from app.db import db_chooser
+from app.hashing import hasher
+from app.roles import role_cache
+
+
+# Rows per transaction; a failed batch only loses its own rows
+IMPORT_BATCH = int(os.getenv("IMPORT_BATCH", "500"))
+# Failures listed in the report, the rest are only counted
+IMPORT_MAX_ERRORS = 1000
+# Largest import over HTTP, in rows and in body bytes; the manage command has no cap
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "10000"))
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(10 * 1024 * 1024)))
+IMPORT_FORMATS = ("csv", "ndjson")
+
+
+class UserImport:
+    """Create users from CSV or NDJSON lines, one transaction per batch.
+
+    Feed it batches of lines, one record per line; a CSV input starts with
+    a header naming at least the CreateUser fields. Rows that do not parse
+    or validate, or whose username is taken, are reported by line number
+    and skipped, the rest of the batch still goes in. Taken usernames are
+    found before hashing, so they cost no bcrypt time, and the remaining
+    passwords are hashed on every worker of the hashing pool.
+
+    Past max_rows the rows up to it still go in, then feed() raises a 413.
+    Batches committed before an error stay in; report(aborted=...) tells
+    the caller how far the import got.
+    """
+    def __init__(self, fmt: str, role_name: str = "user", max_rows: int = None):
+        if fmt not in IMPORT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Cannot import {fmt}, choose from {', '.join(IMPORT_FORMATS)}")
+        self.fmt = fmt
+        self.role_name = role_name
+        self.max_rows = max_rows
+        self.too_many = False
+        self.header = None
+        self.line = 0
+        self.rows = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        # Usernames of earlier batches, to catch a file repeating itself
+        self.seen = set()
+        self.started = perf_counter()
+
+    def fail(self, line: int, username, error: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "username": username, "error": error})
+
+    def parse(self, lines: Iterable[str]):
+        """(line number, record) for each record, failing the ones that don't parse."""
+        for text in lines:
+            self.line += 1
+            if self.line == 1:
+                text = text.lstrip("\ufeff")
+            if not text.strip():
+                continue
+            if self.fmt == "csv" and self.header is None:
+                self.header = next(csv.reader([text]))
+                missing = set(schemas.CreateUser.__fields__) - set(self.header)
+                if missing:
+                    raise HTTPException(status_code=400, detail=f"CSV header is missing {', '.join(sorted(missing))}")
+                continue
+            if self.max_rows is not None and self.rows >= self.max_rows:
+                self.too_many = True
+                return
+            self.rows += 1
+            if self.fmt == "csv":
+                values = next(csv.reader([text]))
+                if len(values) != len(self.header):
+                    self.fail(self.line, None, f"expected {len(self.header)} columns, got {len(values)}")
+                    continue
+                yield self.line, dict(zip(self.header, values))
+            else:
+                try:
+                    record = json.loads(text)
+                except ValueError as e:
+                    self.fail(self.line, None, f"invalid JSON: {e}")
+                    continue
+                if not isinstance(record, dict):
+                    self.fail(self.line, None, "expected a JSON object")
+                    continue
+                yield self.line, record
+
+    def validate(self, lines: Iterable[str]):
+        """(line number, CreateUser) for the valid rows whose username is new to this import."""
+        users = []
+        for line, record in self.parse(lines):
+            try:
+                user = schemas.CreateUser.parse_obj(record)
+            except ValidationError as e:
+                errors = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+                username = record.get("username")
+                self.fail(line, username if isinstance(username, str) else None, errors)
+                continue
+            if user.username.lower() in self.seen:
+                self.fail(line, user.username, "duplicate username in import")
+                continue
+            self.seen.add(user.username.lower())
+            users.append((line, user))
+        return users
+
+    def feed(self, lines: List[str]):
+        users = self.validate(lines)
+        if users:
+            self._insert(users)
+        if self.too_many:
+            raise HTTPException(status_code=413, detail=f"At most {self.max_rows} rows per import")
+
+    def _insert(self, users):
+        with db_chooser.get_session_local("auth")() as db:
+            # Usernames are unique in any case, as for a single registration
+            taken = set(db.scalars(
+                select(model.User.username_lower).where(model.User.username_lower.in_([user.username.lower() for _, user in users]))
+            ))
+            for line, user in users:
+                if user.username.lower() in taken:
+                    self.fail(line, user.username, "Username exists")
+            users = [(line, user) for line, user in users if user.username.lower() not in taken]
+            if not users:
+                return
+
+            hashes = hasher.hash_many([user.passwd for _, user in users])
+            # A registration racing the import loses nothing: its row wins, ours comes back missing.
+            # No conflict target, so it is the unique username_lower index that catches "Alice"
+            # against "alice", and a database still waiting for that index imports all the same.
+            created = dict(db.execute(
+                sqlite_insert(model.User)
+                .on_conflict_do_nothing()
+                .returning(model.User.username, model.User.id),
+                [
+                    {
+                        "username": user.username,
+                        "username_lower": user.username.lower(),
+                        "firstname": user.firstname,
+                        "lastname": user.lastname,
+                        "hashed_pwd": hashed,
+                    }
+                    for (_, user), hashed in zip(users, hashes)
+                ],
+            ).all())
+            for line, user in users:
+                if user.username not in created:
+                    self.fail(line, user.username, "Username exists")
+            if created:
+                role_id = role_cache.role_id(db, self.role_name)
+                db.execute(insert(model.user_roles), [{"user_id": user_id, "role_id": role_id} for user_id in created.values()])
+            db.commit()
+        self.created += len(created)
+
+    def report(self, aborted: str = None) -> dict:
+        seconds = perf_counter() - self.started
+        return {
+            "aborted": aborted,
+            "rows": self.rows,
+            "created": self.created,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda error: error["line"]),
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(self.rows / seconds, 1) if seconds else 0.0,
+        }
+
+
+def line_batches(lines: Iterable[str], size: int = IMPORT_BATCH):
+    """Group an open file's lines for UserImport.feed."""
+    batch = []
+    for line in lines:
+        batch.append(line.rstrip("\r\n"))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def body_batches(chunks, size: int = IMPORT_BATCH, max_bytes: int = None):
+    """Same as line_batches for a request body arriving as byte chunks, a 413 past max_bytes."""
+    batch = []
+    rest = b""
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if max_bytes is not None and received > max_bytes:
+            raise HTTPException(status_code=413, detail=f"At most {max_bytes} bytes per import")
+        *lines, rest = (rest + chunk).split(b"\n")
+        for line in lines:
+            batch.append(line.decode(errors="replace").rstrip("\r"))
+            if len(batch) >= size:
+                yield batch
+                batch = []
+    if rest:
+        batch.append(rest.decode(errors="replace").rstrip("\r"))
+    if batch:
+        yield batch
@@ -0,0 +1,20 @@
+from sqlalchemy import and_
+
+
+# Most rows a prefix search returns, it feeds an autocomplete list
+PREFIX_SEARCH_MAX = 50
+
+
+def prefix_filter(column, prefix: str):
+    """column starts with prefix, as a range the column's index can seek into.
+
+    SQLite only runs LIKE 'p%' off an index under case_sensitive_like; the
+    range [prefix, prefix with its last character bumped) works on any index.
+    """
+    last = ord(prefix[-1]) + 1
+    if 0xD800 <= last <= 0xDFFF:
+        # Surrogates can't be encoded, the next character after them is U+E000
+        last = 0xE000
+    if last > 0x10FFFF:
+        return column >= prefix
+    return and_(column >= prefix, column < prefix[:-1] + chr(last))
@@ -0,0 +1,69 @@
+"""Rows/sec for the bulk create endpoints against the one-row-per-call routes.
+
+Run from API_Unittest:
+
+    python -m benchmarks.bulk --rows 2000 --batch 500
+
+Goes through the app in process like benchmarks.load, so rows land in the
+configured blog.db.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app.main import app
+
+
+async def single(client, author_id, post_id, rows):
+    for i in range(rows):
+        await client.post("/blog/posts/", params={"author_id": author_id}, json={"title": f"Single {i}", "content": "bench"})
+    for i in range(rows):
+        await client.post(f"/blog/posts/{post_id}/comments/", json={"content": f"Single {i}"})
+
+
+async def bulk(client, author_id, post_id, rows, batch):
+    for start in range(0, rows, batch):
+        size = min(batch, rows - start)
+        response = await client.post("/blog/posts/bulk", json=[
+            {"title": f"Bulk {start + i}", "content": "bench", "author_id": author_id} for i in range(size)])
+        response.raise_for_status()
+    for start in range(0, rows, batch):
+        size = min(batch, rows - start)
+        response = await client.post("/blog/comments/bulk", json=[
+            {"content": f"Bulk {start + i}", "post_id": post_id} for i in range(size)])
+        response.raise_for_status()
+
+
+async def run(args):
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            author = (await client.post("/blog/authors/", json={"name": f"bench-{time.time()}"})).json()
+            post = (await client.post("/blog/posts/", params={"author_id": author["id"]},
+                                      json={"title": "Bench", "content": "bench"})).json()
+            results = {}
+            for name, path in (("single", single(client, author["id"], post["id"], args.rows)),
+                               ("bulk", bulk(client, author["id"], post["id"], args.rows, args.batch))):
+                start = time.perf_counter()
+                await path
+                results[name] = time.perf_counter() - start
+            return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bulk")
+    parser.add_argument("--rows", type=int, default=2000, help="posts and comments to create per path")
+    parser.add_argument("--batch", type=int, default=500, help="items per bulk request")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    print(f"{'path':8} {'seconds':>9} {'rows/s':>10}")
+    for name, elapsed in results.items():
+        print(f"{name:8} {elapsed:9.3f} {2 * args.rows / elapsed:10.1f}")
+    print(f"bulk is {results['single'] / results['bulk']:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
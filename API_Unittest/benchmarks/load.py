@@ -0,0 +1,327 @@
+"""End-to-end load benchmark for the app in app/main.py.
+
+Run from API_Unittest:
+
+    python -m benchmarks.load --mix blog=5,shop=3,task=3,auth=1,library=1 -c 20 -d 15 --save baseline.json
+    python -m benchmarks.load --compare baseline.json
+
+Traffic goes through httpx's in-process ASGI transport by default; --uvicorn
+serves the app on a real socket instead. Results are reported per route
+template (throughput, errors and p50/p95/p99 latency). --save writes them as
+a JSON baseline and --compare flags routes whose p50 or p95 latency regressed
+by more than --threshold or that fail more often than in the baseline, and a
+drop in total throughput. Per route throughput is not compared, it mostly
+follows how the weighted mix happened to sample. The mix is drawn from
+--seed, so runs with the same seed send the same sequence of requests.
+
+The databases are throwaway files in a temporary directory, the app's own
+auth.db, blog.db, task.db and shop.db are not touched.
+
+Every request comes from one client logging in as a few users, so the login
+rate limits are lifted unless RATE_LIMIT_* is set in the environment.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+
+# Read by app.ratelimit at import; otherwise the auth mix measures 429s
+for name in ("RATE_LIMIT_IP_BURST", "RATE_LIMIT_IP_PER_MINUTE", "RATE_LIMIT_USER_BURST", "RATE_LIMIT_USER_PER_MINUTE"):
+    os.environ.setdefault(name, "1000000000")
+
+from app.db import db_chooser
+from app.main import app
+
+
+DEFAULT_MIX = "blog=5,shop=3,task=3,auth=1,library=1"
+
+
+class Scenario:
+    """Seeded ids plus one coroutine per request kind, grouped by router."""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.counter = itertools.count()
+        self.run_id = f"{int(time.time())}{random.randint(0, 9999)}"
+        self.post_ids = []
+        self.product_ids = []
+        self.customer_ids = []
+        self.task_ids = []
+        self.usernames = []
+
+    def unique(self, prefix):
+        return f"{prefix}-{self.run_id}-{next(self.counter)}"
+
+    async def seed(self, rows=20):
+        client = self.client
+        author = (await client.post("/blog/authors/", json={"name": self.unique("author")})).json()
+        category = (await client.post("/shop/category", json={"name": self.unique("category")})).json()
+        for i in range(rows):
+            post = (await client.post("/blog/posts/", params={"author_id": author["id"]},
+                                      json={"title": f"Post {i}", "content": "lorem ipsum " * 20})).json()
+            self.post_ids.append(post["id"])
+            await client.post(f"/blog/posts/{post['id']}/comments/", json={"content": "seed comment"})
+            product = (await client.post("/shop/create_product", json={
+                "name": f"Product {i}", "description": "seed", "price": 9.99, "category_id": category["id"]
+            })).json()
+            self.product_ids.append(product["id"])
+            customer = (await client.post("/shop/customer", json={
+                "name": f"Customer {i}", "email": f"{self.unique('customer')}@example.com"
+            })).json()
+            self.customer_ids.append(customer["id"])
+            task = (await client.post("/task/tasks/1", json={"title": f"Task {i}", "description": "seed"})).json()
+            self.task_ids.append(task["id"])
+        for _ in range(2):
+            username = self.unique("user")
+            await client.post("/auth/register_user", json={
+                "username": username, "firstname": "Bench", "lastname": "User", "passwd": "benchpassword"
+            })
+            self.usernames.append(username)
+
+    # Each request returns (route template, response)
+    async def blog_list_posts(self):
+        return "GET /blog/posts/", await self.client.get("/blog/posts/")
+
+    async def blog_read_post(self):
+        post_id = random.choice(self.post_ids)
+        return "GET /blog/posts/{post_id}", await self.client.get(f"/blog/posts/{post_id}")
+
+    async def blog_list_authors(self):
+        return "GET /blog/authors/", await self.client.get("/blog/authors/")
+
+    async def blog_comment(self):
+        post_id = random.choice(self.post_ids)
+        return "POST /blog/posts/{post_id}/comments/", await self.client.post(
+            f"/blog/posts/{post_id}/comments/", json={"content": "bench comment"})
+
+    async def shop_list_products(self):
+        return "GET /shop/products_list/", await self.client.get("/shop/products_list/")
+
+    async def shop_read_product(self):
+        product_id = random.choice(self.product_ids)
+        return "GET /shop/product/{product_id}/", await self.client.get(f"/shop/product/{product_id}/")
+
+    async def shop_create_order(self):
+        return "POST /shop/create_order", await self.client.post("/shop/create_order", json={
+            "product_id": random.choice(self.product_ids),
+            "customer_id": random.choice(self.customer_ids),
+            "quantity": random.randint(1, 5),
+        })
+
+    async def task_list(self):
+        return "GET /task/tasks/", await self.client.get("/task/tasks/")
+
+    async def task_update(self):
+        task_id = random.choice(self.task_ids)
+        return "PUT /task/tasks/{task_id}", await self.client.put(
+            f"/task/tasks/{task_id}", json={"title": "Updated", "description": "bench", "completed": True})
+
+    async def auth_login(self):
+        return "POST /auth/login", await self.client.post("/auth/login", data={
+            "username": random.choice(self.usernames), "password": "benchpassword"})
+
+    async def auth_read_user(self):
+        return "GET /auth/users_n/{user_name}", await self.client.get(f"/auth/users_n/{random.choice(self.usernames)}")
+
+    async def library_cycle(self):
+        book_id = self.unique("book")
+        await self.client.post("/lib/books/", json={
+            "id": book_id, "title": "Bench", "author": "Bench", "publication": "Bench", "year": 2024, "genre": "Bench"})
+        return "GET /lib/one_book/{bk_id}", await self.client.get(f"/lib/one_book/{book_id}")
+
+    def groups(self):
+        return {
+            "blog": [self.blog_list_posts, self.blog_read_post, self.blog_list_authors, self.blog_comment],
+            "shop": [self.shop_list_products, self.shop_read_product, self.shop_create_order],
+            "task": [self.task_list, self.task_update],
+            "auth": [self.auth_login, self.auth_read_user],
+            "library": [self.library_cycle],
+        }
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, errors, elapsed):
+    routes = {}
+    for route, latencies in sorted(samples.items()):
+        latencies.sort()
+        routes[route] = {
+            "requests": len(latencies),
+            "errors": errors.get(route, 0),
+            "rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        }
+    total = sum(route["requests"] for route in routes.values())
+    return {"elapsed_s": round(elapsed, 3), "requests": total, "rps": round(total / elapsed, 2), "routes": routes}
+
+
+async def drive(client, args):
+    scenario = Scenario(client)
+    await scenario.seed(args.seed_rows)
+
+    groups = scenario.groups()
+    mix = parse_mix(args.mix)
+    unknown = set(mix) - set(groups)
+    if unknown:
+        raise SystemExit(f"unknown traffic group: {', '.join(sorted(unknown))}")
+    requests = [request for name in mix for request in groups[name]]
+    weights = [mix[name] / len(groups[name]) for name in mix for _ in groups[name]]
+
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    deadline = time.perf_counter() + args.duration
+    remaining = itertools.count() if args.requests is None else iter(range(args.requests))
+
+    # Only the workers draw from it, so the n-th request is the same every run
+    schedule = random.Random(args.seed)
+
+    async def worker():
+        while time.perf_counter() < deadline and next(remaining, None) is not None:
+            request = schedule.choices(requests, weights)[0]
+            start = time.perf_counter()
+            route, response = await request()
+            samples[route].append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors[route] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return summarize(samples, errors, time.perf_counter() - start)
+
+
+async def run_in_process(args):
+    # ASGITransport does not send lifespan events, run them by hand
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await drive(client, args)
+
+
+async def run_uvicorn(args):
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        await asyncio.sleep(0.05)
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+            return await drive(client, args)
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def use_databases_in(directory):
+    """Point every database at a file in directory, before any engine is created."""
+    db_chooser.dispose()
+    for name in db_chooser.db_names:
+        setattr(db_chooser, f"{name}_db_url", f"sqlite:///{os.path.join(directory, name)}.db")
+
+
+def error_rate(row):
+    return row["errors"] / row["requests"] if row["requests"] else 0.0
+
+
+def compare(baseline, current, threshold, slack_ms=0.0):
+    """Return one message per route whose errors or latency got worse than threshold allows,
+    and one if total throughput did.
+
+    Errors come first: a route that starts failing fast (429, 404, 500)
+    would otherwise read as faster and pass. Latency also has to grow by
+    slack_ms, a few milliseconds of scheduling jitter is not a regression.
+    """
+    regressions = []
+    if baseline["rps"] and current["rps"] < baseline["rps"] * (1 - threshold):
+        regressions.append(f"total: rps {baseline['rps']} -> {current['rps']}")
+    for route, before in baseline["routes"].items():
+        after = current["routes"].get(route)
+        if after is None:
+            continue
+        before_rate, after_rate = error_rate(before), error_rate(after)
+        if (after["errors"] and not before["errors"]) or after_rate > before_rate + threshold:
+            regressions.append(f"{route}: errors {before['errors']}/{before['requests']} -> {after['errors']}/{after['requests']}")
+        for pct in ("p50", "p95"):
+            if before[f"{pct}_ms"] and after[f"{pct}_ms"] > before[f"{pct}_ms"] * (1 + threshold) + slack_ms:
+                regressions.append(f"{route}: {pct} {before[f'{pct}_ms']}ms -> {after[f'{pct}_ms']}ms")
+    return regressions
+
+
+def print_report(result):
+    print(f"{'route':45} {'reqs':>7} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, row in result["routes"].items():
+        print(f"{route:45} {row['requests']:7} {row['errors']:5} {row['rps']:9} "
+              f"{row['p50_ms']:9} {row['p95_ms']:9} {row['p99_ms']:9}")
+    print(f"total: {result['requests']} requests in {result['elapsed_s']}s, {result['rps']} req/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"traffic weights per router (default {DEFAULT_MIX})")
+    parser.add_argument("-c", "--concurrency", type=int, default=10)
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("-n", "--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--seed-rows", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1, help="random seed of the request mix")
+    parser.add_argument("--uvicorn", action="store_true", help="go through a real uvicorn socket")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to check the results against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed regression, 0.10 is 10%% slower, 10%% less total throughput or 10 points more errors")
+    parser.add_argument("--slack-ms", type=float, default=5.0, help="latency growth always allowed on top of --threshold")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        use_databases_in(directory)
+        random.seed(args.seed)
+        try:
+            result = asyncio.run(run_uvicorn(args) if args.uvicorn else run_in_process(args))
+        finally:
+            db_chooser.dispose()
+    result["config"] = {"mix": args.mix, "concurrency": args.concurrency, "uvicorn": args.uvicorn, "seed": args.seed}
+    print_report(result)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), result, args.threshold, args.slack_ms)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compare the blog FTS5 index with a LIKE scan over the same rows.
+
+Run from API_Unittest:
+
+    python -m benchmarks.search --posts 20000 --queries 50
+
+Builds a throwaway blog database in a temporary directory (the app's blog.db
+is not touched), fills it with random posts and comments, then times the
+search endpoint's query against the equivalent LIKE '%term%' filter.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert, text
+
+from app import model, search
+
+
+# A few common words over a long tail of rare ones, roughly like real text
+COMMON = "sqlite index query cursor page author post comment search rank".split()
+RARE = [f"term{n}" for n in range(5000)]
+
+
+def sentence(words):
+    return " ".join(random.choice(COMMON) if random.random() < 0.3 else random.choice(RARE) for _ in range(words))
+
+
+def seed(engine, posts, comments_per_post):
+    model.Base.metadata.create_all(bind=engine, tables=model.tables_for("blog"))
+    with engine.begin() as conn:
+        search.init_fts(conn)
+        conn.execute(insert(model.Author), [{"id": 1, "name": "bench"}])
+        conn.execute(insert(model.Post), [
+            {"id": i, "title": sentence(6), "content": sentence(120), "author_id": 1} for i in range(1, posts + 1)
+        ])
+        conn.execute(insert(model.Comment), [
+            {"content": sentence(25), "post_id": i} for i in range(1, posts + 1) for _ in range(comments_per_post)
+        ])
+
+
+def timed(conn, sql, params):
+    start = time.perf_counter()
+    rows = conn.execute(text(sql), params).all()
+    return time.perf_counter() - start, len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.search")
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--comments-per-post", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'blog.db')}")
+        start = time.perf_counter()
+        seed(engine, args.posts, args.comments_per_post)
+        print(f"seeded {args.posts} posts in {time.perf_counter() - start:.2f}s")
+
+        page = search.SearchPage("x", "posts", None, args.limit)
+        fts_sql = str(page.statement())
+        like_sql = ("SELECT id FROM posts WHERE (title || ' ' || content) LIKE :first "
+                    "AND (title || ' ' || content) LIKE :second ORDER BY id LIMIT :limit")
+        terms = [f"{random.choice(COMMON)} {random.choice(RARE)}" for _ in range(args.queries)]
+
+        results = {"fts5": [], "like": []}
+        with engine.connect() as conn:
+            for term in terms:
+                elapsed, _ = timed(conn, fts_sql, {"query": search.match_query(term), "limit": args.limit + 1})
+                results["fts5"].append(elapsed)
+                first, second = term.split()
+                elapsed, _ = timed(conn, like_sql, {"first": f"%{first}%", "second": f"%{second} %", "limit": args.limit + 1})
+                results["like"].append(elapsed)
+        engine.dispose()
+
+    print(f"{'query':8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for name, samples in results.items():
+        samples.sort()
+        p95 = samples[max(0, round(0.95 * len(samples)) - 1)]
+        print(f"{name:8} {statistics.median(samples) * 1000:9.3f} {p95 * 1000:9.3f} {samples[-1] * 1000:9.3f}")
+    print("LIKE returns unranked id order; FTS5 ranks every match with bm25.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+from app import schema
+from app.query_stats import QUERY_COUNT_HEADER
+
+
+class QueryBudgetMixin:
+    """assertQueryBudget() checks the statements a request ran, as reported
+    by QueryStatsMiddleware, so N+1 regressions fail the test run."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Keep schema setup out of the first request's count
+        schema.init_all()
+
+    def assertQueryBudget(self, response, budget):
+        count = int(response.headers[QUERY_COUNT_HEADER])
+        self.assertLessEqual(
+            count, budget,
+            f"{response.request.method} {response.request.url.path} ran {count} queries, budget is {budget}"
+        )
@@ -0,0 +1,54 @@
+import unittest
+import uuid
+from fastapi.testclient import TestClient
+from app.main import app
+from app.choose_db import SQLITE_PRAGMAS
+
+client = TestClient(app)
+
+
+def login(route):
+    username = f"admin_{uuid.uuid4().hex[:8]}"
+    client.post(route, json={"username": username, "firstname": "Db", "lastname": "Admin", "passwd": "adminpass"})
+    token = client.post("/auth/login", data={"username": username, "password": "adminpass"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestAdmin(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.headers = login("/auth/register_admin")
+
+    def test_requires_admin(self):
+        self.assertEqual(client.get("/admin/db/pragmas").status_code, 401)
+        headers = login("/auth/register_user")
+        self.assertEqual(client.get("/admin/db/blog/pragmas", headers=headers).status_code, 403)
+
+    def test_read_pragmas(self):
+        response = client.get("/admin/db/blog/pragmas", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["journal_mode"], "wal")
+        self.assertEqual(response.json()["cache_size"], SQLITE_PRAGMAS["blog"]["cache_size"])
+        self.assertEqual(response.json()["mmap_size"], SQLITE_PRAGMAS["blog"]["mmap_size"])
+
+    def test_pragmas_per_db(self):
+        response = client.get("/admin/db/pragmas", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {"auth", "blog", "task", "shop"})
+        self.assertEqual(response.json()["shop"]["busy_timeout"], SQLITE_PRAGMAS["shop"]["busy_timeout"])
+        self.assertEqual(response.json()["auth"]["synchronous"], 2)
+
+    def test_read_pragmas_readonly_pool(self):
+        response = client.get("/admin/db/blog/pragmas", params={"readonly": True}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["query_only"], 1)
+        self.assertEqual(response.json()["journal_mode"], "wal")
+
+    def test_read_pragmas_unknown_db(self):
+        response = client.get("/admin/db/nope/pragmas", headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
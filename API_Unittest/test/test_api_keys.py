@@ -0,0 +1,83 @@
+import unittest
+import uuid
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from app import model, schemas
+from app.db import db_chooser
+from app.dependencies import get_caller, hash_api_key
+from app.main import app
+from app.query_stats import QueryStatsMiddleware
+from test.helpers import QueryBudgetMixin
+
+client = TestClient(app)
+
+# A route behind get_caller, the task and shop routers only get it with REQUIRE_AUTH=1
+caller_app = FastAPI()
+caller_app.add_middleware(QueryStatsMiddleware)
+
+@caller_app.get("/whoami")
+async def whoami(user: schemas.CurrentUser = Depends(get_caller)):
+    return {"username": user.username}
+
+caller = TestClient(caller_app)
+
+
+def login():
+    username = f"keys_{uuid.uuid4().hex[:8]}"
+    client.post("/auth/register_user", json={"username": username, "firstname": "Key", "lastname": "Owner", "passwd": "keypassword"})
+    token = client.post("/auth/login", data={"username": username, "password": "keypassword"}).json()["access_token"]
+    return username, {"Authorization": f"Bearer {token}"}
+
+
+class TestApiKeys(QueryBudgetMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.username, self.headers = login()
+
+    def create_key(self, name="ci"):
+        response = client.post("/auth/api-keys", json={"name": name}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_create_and_list(self):
+        created = self.create_key()
+        self.assertTrue(created["key"].startswith(created["prefix"]))
+        self.assertIsNone(created["revoked_at"])
+        listed = client.get("/auth/api-keys", headers=self.headers).json()
+        self.assertEqual([(key["id"], key["name"]) for key in listed], [(created["id"], "ci")])
+        self.assertNotIn("key", listed[0])
+        # Only the keyed hash is stored
+        with db_chooser.get_session_local("auth", readonly=True)() as db:
+            row = db.get(model.ApiKey, created["id"])
+            self.assertEqual(row.key_hash, hash_api_key(created["key"]))
+            self.assertNotIn(created["key"], (row.name, row.prefix, row.key_hash))
+
+    def test_caller_accepts_key_or_token(self):
+        key = self.create_key()["key"]
+        response = caller.get("/whoami", headers={"X-API-Key": key})
+        self.assertEqual(response.json(), {"username": self.username})
+        # Key and user now come from the caches
+        self.assertQueryBudget(caller.get("/whoami", headers={"X-API-Key": key}), 0)
+        self.assertEqual(caller.get("/whoami", headers=self.headers).json(), {"username": self.username})
+        self.assertEqual(caller.get("/whoami").status_code, 401)
+        self.assertEqual(caller.get("/whoami", headers={"X-API-Key": "sk_nonsense"}).status_code, 401)
+
+    def test_key_cannot_manage_keys(self):
+        key = self.create_key()["key"]
+        self.assertEqual(client.post("/auth/api-keys", json={"name": "more"}, headers={"X-API-Key": key}).status_code, 401)
+
+    def test_revoke(self):
+        created = self.create_key()
+        self.assertEqual(caller.get("/whoami", headers={"X-API-Key": created["key"]}).status_code, 200)
+        response = client.delete(f"/auth/api-keys/{created['id']}", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()["revoked_at"])
+        # Dropped from the cache at once in this process
+        self.assertEqual(caller.get("/whoami", headers={"X-API-Key": created["key"]}).status_code, 401)
+
+        _, other = login()
+        self.assertEqual(client.delete(f"/auth/api-keys/{created['id']}", headers=other).status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
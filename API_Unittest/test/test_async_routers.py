@@ -0,0 +1,116 @@
+import os
+import unittest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from app import model
+from app.db import db_chooser
+from app.Router.aio import auth, blog, task
+from app.Router.aio.shop import products, categories, orders, customers
+
+# Setup the test database
+SQLALCHEMY_DATABASE_FILE = "./test_async.db"
+engine = create_engine(f"sqlite:///{SQLALCHEMY_DATABASE_FILE}")
+
+app = FastAPI()
+app.include_router(auth.router, prefix="/auth")
+app.include_router(blog.router, prefix="/blog")
+app.include_router(task.router, prefix="/task")
+app.include_router(products.router, prefix="/shop")
+app.include_router(categories.router, prefix="/shop")
+app.include_router(orders.router, prefix="/shop")
+app.include_router(customers.router, prefix="/shop")
+
+
+class TestAsyncRouters(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        model.Base.metadata.create_all(bind=engine)
+        # One event loop for the whole class so pooled connections stay valid
+        cls.client = TestClient(app)
+        cls.client.__enter__()
+        for name in ("auth", "blog", "task", "shop"):
+            cls.client.portal.call(db_chooser.set_async_engine, name, create_async_engine(f"sqlite+aiosqlite:///{SQLALCHEMY_DATABASE_FILE}"))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.portal.call(db_chooser.dispose_async)
+        cls.client.__exit__(None, None, None)
+        model.Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        os.remove(SQLALCHEMY_DATABASE_FILE)
+
+    def test_register_and_login(self):
+        response = self.client.post("/auth/register_user", json={
+            "username": "asyncuser",
+            "firstname": "Async",
+            "lastname": "User",
+            "passwd": "asyncpassword"
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["username"], "asyncuser")
+
+        response = self.client.post("/auth/login", data={"username": "asyncuser", "password": "asyncpassword"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["token_type"], "bearer")
+
+    def test_blog_nested_reads(self):
+        author_id = self.client.post("/blog/authors/", json={"name": "Async Author"}).json()["id"]
+        post = self.client.post("/blog/posts/", json={"title": "Async", "content": "Body"}, params={"author_id": author_id}).json()
+        self.assertEqual(post["comments"], [])
+        self.client.post(f"/blog/posts/{post['id']}/comments/", json={"content": "Nice"})
+
+        response = self.client.get(f"/blog/posts/{post['id']}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["comments"][0]["content"], "Nice")
+
+        response = self.client.get("/blog/authors/")
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(response.json()[0]["posts"]), 0)
+
+        response = self.client.put(f"/blog/posts/{post['id']}", json={"title": "Updated", "content": "Body"})
+        self.assertEqual(response.json()["title"], "Updated")
+
+        post_id = self.client.post("/blog/posts/", json={"title": "Delete", "content": "Me"}, params={"author_id": author_id}).json()["id"]
+        self.assertEqual(self.client.delete(f"/blog/posts/{post_id}").status_code, 200)
+        self.assertEqual(self.client.get(f"/blog/posts/{post_id}").status_code, 404)
+
+    def test_task_crud(self):
+        task_id = self.client.post("/task/tasks/1", json={"title": "Async task", "description": "Async"}).json()["id"]
+        response = self.client.put(f"/task/tasks/{task_id}", json={"title": "Done", "completed": True})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["completed"])
+        self.assertGreater(len(self.client.get("/task/tasks/").json()), 0)
+        self.assertEqual(self.client.delete(f"/task/task/{task_id}").status_code, 200)
+
+    def test_shop_product(self):
+        category_id = self.client.post("/shop/category", json={"name": "Async"}).json()["id"]
+        response = self.client.post("/shop/create_product", json={
+            "name": "Widget", "description": "A widget", "price": 9.5, "category_id": category_id
+        })
+        self.assertEqual(response.status_code, 200)
+        product_id = response.json()["id"]
+        self.assertEqual(self.client.get(f"/shop/product/{product_id}/").json()["name"], "Widget")
+        self.assertEqual(self.client.get("/shop/product/999999/").status_code, 404)
+
+    def test_shop_reads_by_id(self):
+        category_id = self.client.post("/shop/category", json={"name": "Reads"}).json()["id"]
+        product_id = self.client.post("/shop/create_product", json={
+            "name": "Gadget", "description": "A gadget", "price": 3.0, "category_id": category_id
+        }).json()["id"]
+        customer_id = self.client.post("/shop/customer", json={"name": "Ada", "email": "ada@example.com"}).json()["id"]
+        order_id = self.client.post("/shop/create_order", json={
+            "product_id": product_id, "customer_id": customer_id, "quantity": 2
+        }).json()["id"]
+
+        self.assertEqual(self.client.get(f"/shop/category/{category_id}/").json()["name"], "Reads")
+        self.assertEqual(self.client.get(f"/shop/customer/{customer_id}/").json()["email"], "ada@example.com")
+        self.assertEqual(self.client.get(f"/shop/order/{order_id}/").json()["quantity"], 2)
+        for path in ("category", "customer", "order"):
+            self.assertEqual(self.client.get(f"/shop/{path}/999999/").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
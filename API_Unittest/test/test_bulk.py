@@ -0,0 +1,56 @@
+import unittest
+from fastapi.testclient import TestClient
+from app import bulk
+from app.main import app
+from test.helpers import QueryBudgetMixin
+
+client = TestClient(app)
+
+
+class TestBulkCreate(QueryBudgetMixin, unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = client.post("/blog/authors/", json={"name": "Bulk Author"}).json()
+
+    def test_bulk_posts_and_comments(self):
+        items = [{"title": f"Bulk {i}", "content": "Imported", "author_id": self.author["id"]} for i in range(20)]
+        response = client.post("/blog/posts/bulk", json=items)
+        self.assertEqual(response.status_code, 200)
+        # The author check and one batched INSERT ... RETURNING
+        self.assertQueryBudget(response, 2)
+        ids = response.json()["ids"]
+        self.assertEqual(len(ids), 20)
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(client.get(f"/blog/posts/{ids[7]}").json()["title"], "Bulk 7")
+
+        response = client.post("/blog/comments/bulk", json=[{"content": f"Comment {i}", "post_id": ids[0]} for i in range(3)])
+        self.assertEqual(response.status_code, 200)
+        post = client.get(f"/blog/posts/{ids[0]}").json()
+        self.assertEqual([c["id"] for c in post["comments"]], response.json()["ids"])
+
+    def test_per_item_errors(self):
+        before = client.get("/blog/posts/", params={"sort": "-id", "limit": 1}).json()
+        response = client.post("/blog/posts/bulk", json=[
+            {"title": "Good", "content": "Fine", "author_id": self.author["id"]},
+            {"title": "No content", "author_id": self.author["id"]},
+            {"title": "Nobody", "content": "Fine", "author_id": 999999},
+            "not an object",
+        ])
+        self.assertEqual(response.status_code, 422)
+        errors = response.json()["detail"]
+        self.assertEqual([error["index"] for error in errors], [1, 2, 3])
+        self.assertEqual(errors[0]["errors"][0]["loc"], ["content"])
+        self.assertEqual(errors[1]["errors"][0]["msg"], "Author not found")
+        # Nothing was inserted, not even the valid item
+        self.assertEqual(client.get("/blog/posts/", params={"sort": "-id", "limit": 1}).json(), before)
+
+    def test_limits(self):
+        self.assertEqual(client.post("/blog/comments/bulk", json=[]).json(), {"ids": []})
+        items = [{"content": "Too many", "post_id": 1}] * (bulk.BULK_MAX_ITEMS + 1)
+        self.assertEqual(client.post("/blog/comments/bulk", json=items).status_code, 413)
+
+
+if __name__ == "__main__":
+    unittest.main()
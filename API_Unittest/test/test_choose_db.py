@@ -0,0 +1,86 @@
+import asyncio
+import unittest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.choose_db import ChooseDB
+from app.db import get_db
+
+
+class TestChooseDB(unittest.TestCase):
+
+    def setUp(self):
+        self.chooser = ChooseDB()
+
+    def tearDown(self):
+        self.chooser.dispose()
+
+    def test_engine_is_reused(self):
+        engine = self.chooser.get_engine("blog")
+        self.assertIs(engine, self.chooser.get_engine("blog"))
+        self.assertIsNot(engine, self.chooser.get_engine("shop"))
+
+    def test_session_local_is_reused(self):
+        session_local = self.chooser.get_session_local("task")
+        self.assertIs(session_local, self.chooser.get_session_local("task"))
+        self.assertIs(session_local.kw["bind"], self.chooser.get_engine("task"))
+
+    def test_pool_settings_per_db(self):
+        self.assertEqual(self.chooser.get_engine("shop").pool.size(), 10)
+        self.assertEqual(self.chooser.get_engine("auth").pool.size(), 5)
+
+    def test_set_engine(self):
+        engine = create_engine("sqlite://")
+        self.chooser.get_session_local("auth")
+        self.chooser.set_engine("auth", engine)
+        self.assertIs(self.chooser.get_engine("auth"), engine)
+        self.assertIs(self.chooser.get_engine("auth", readonly=True), engine)
+        self.assertIs(self.chooser.get_session_local("auth").kw["bind"], engine)
+
+    def test_set_async_engine_disposes_old(self):
+        async def swap():
+            first = create_async_engine("sqlite+aiosqlite://")
+            await self.chooser.set_async_engine("auth", first)
+            async with first.connect():
+                pass
+            pool = first.sync_engine.pool
+            second = create_async_engine("sqlite+aiosqlite://")
+            await self.chooser.set_async_engine("auth", second)
+            # Disposed: the old pool and its aiosqlite connection are closed, not left to leak
+            self.assertIsNot(first.sync_engine.pool, pool)
+            self.assertIs(self.chooser.get_async_engine("auth", readonly=True), second)
+            await self.chooser.dispose_async()
+        asyncio.run(swap())
+
+    def test_readonly_pool(self):
+        writer = self.chooser.get_engine("task")
+        reader = self.chooser.get_engine("task", readonly=True)
+        self.assertIsNot(writer, reader)
+        self.assertIn("mode=ro", str(reader.url))
+
+        with writer.begin() as conn:
+            conn.execute(text("CREATE TABLE IF NOT EXISTS ro_check (id INTEGER)"))
+        with reader.connect() as conn:
+            self.assertEqual(conn.exec_driver_sql("PRAGMA query_only").scalar(), 1)
+            conn.execute(text("SELECT count(*) FROM ro_check"))
+            with self.assertRaises(OperationalError):
+                conn.execute(text("INSERT INTO ro_check VALUES (1)"))
+        with writer.begin() as conn:
+            conn.execute(text("DROP TABLE ro_check"))
+
+    def test_readonly_pool_settings(self):
+        self.assertEqual(self.chooser.get_engine("blog", readonly=True).pool.size(), 10)
+        self.assertEqual(self.chooser.get_engine("blog").pool.size(), 5)
+
+    def test_get_db_is_cached(self):
+        self.assertIs(get_db("blog"), get_db("blog", readonly=False))
+        self.assertIsNot(get_db("blog"), get_db("blog", readonly=True))
+
+    def test_dispose(self):
+        engine = self.chooser.get_engine("blog")
+        self.chooser.dispose()
+        self.assertIsNot(engine, self.chooser.get_engine("blog"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import uuid
+from fastapi.testclient import TestClient
+from app import model
+from app.db import db_chooser
+from app.dependencies import claims_cache, create_access_token, user_cache
+from app.main import app
+from test.helpers import QueryBudgetMixin
+
+client = TestClient(app)
+
+
+class TestCurrentUser(QueryBudgetMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.username = f"me_{uuid.uuid4().hex[:8]}"
+        client.post("/auth/register_user", json={"username": self.username, "firstname": "Me", "lastname": "User", "passwd": "mypassword"})
+        token = client.post("/auth/login", data={"username": self.username, "password": "mypassword"}).json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def test_read_me(self):
+        response = client.get("/auth/me", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["username"], self.username)
+        self.assertEqual(response.json()["roles"], ["user"])
+        # Claims and user now come from the caches
+        self.assertQueryBudget(client.get("/auth/me", headers=self.headers), 0)
+
+    def test_rejects_bad_tokens(self):
+        self.assertEqual(client.get("/auth/me").status_code, 401)
+        self.assertEqual(client.get("/auth/me", headers={"Authorization": "Bearer nonsense"}).status_code, 401)
+        stranger = create_access_token({"sub": "no_such_user_anywhere"})
+        self.assertEqual(client.get("/auth/me", headers={"Authorization": f"Bearer {stranger}"}).status_code, 401)
+
+    def test_user_change_invalidates_cache(self):
+        client.get("/auth/me", headers=self.headers)
+        self.assertIsNotNone(user_cache.get(self.username))
+        with db_chooser.get_session_local("auth")() as db:
+            user = db.query(model.User).filter(model.User.username == self.username).first()
+            user.active = False
+            db.commit()
+        self.assertIsNone(user_cache.get(self.username))
+        self.assertEqual(client.get("/auth/me", headers=self.headers).status_code, 403)
+
+    def test_claims_cache_is_bounded(self):
+        for i in range(claims_cache.maxsize + 5):
+            claims_cache.set(f"token-{i}", {"sub": "x"}, expires_at=None)
+        self.assertEqual(len(claims_cache), claims_cache.maxsize)
+        claims_cache.clear()
+
+
+if __name__ == "__main__":
+    unittest.main()
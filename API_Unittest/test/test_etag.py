@@ -0,0 +1,65 @@
+import unittest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.query_stats import QUERY_COUNT_HEADER
+
+client = TestClient(app)
+
+
+class TestETag(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        author = client.post("/blog/authors/", json={"name": "ETag Author"}).json()
+        cls.post = client.post("/blog/posts/", params={"author_id": author["id"]},
+                               json={"title": "Cached", "content": "Polled a lot"}).json()
+
+    def get(self, url, tag=None, **params):
+        return client.get(url, params=params, headers={"If-None-Match": tag} if tag else {})
+
+    def assertNotModified(self, url, tag, **params):
+        response = self.get(url, tag, **params)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["etag"], tag)
+        # Only the version lookup ran
+        self.assertEqual(response.headers[QUERY_COUNT_HEADER], "1")
+
+    def test_read_post_not_modified(self):
+        url = f"/blog/posts/{self.post['id']}"
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        tag = response.headers["etag"]
+        self.assertNotModified(url, tag)
+        self.assertEqual(self.get(url, "*").status_code, 304)
+        # Another representation gets another tag
+        self.assertNotEqual(self.get(url, expand="").headers["etag"], tag)
+
+    def test_read_post_changes(self):
+        url = f"/blog/posts/{self.post['id']}"
+        tag = self.get(url).headers["etag"]
+        client.post(f"{url}/comments/", json={"content": "New comment"})
+        response = self.get(url, tag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["etag"], tag)
+
+        tag = response.headers["etag"]
+        client.put(url, json={"title": "Cached", "content": "Edited"})
+        response = self.get(url, tag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["content"], "Edited")
+
+    def test_read_posts_not_modified(self):
+        response = self.get("/blog/posts/", limit=3)
+        tag = response.headers["etag"]
+        self.assertNotModified("/blog/posts/", tag, limit=3)
+        self.assertEqual(self.get("/blog/posts/", tag, limit=4).status_code, 200)
+
+        client.post(f"/blog/posts/{self.post['id']}/comments/", json={"content": "Bumps the list"})
+        self.assertEqual(self.get("/blog/posts/", tag, limit=3).status_code, 200)
+
+    def test_missing_post(self):
+        self.assertEqual(self.get("/blog/posts/999999", "*").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import json
+import unittest
+from fastapi.testclient import TestClient
+from app import export
+from app.main import app
+
+client = TestClient(app)
+
+
+class TestExport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        author = client.post("/blog/authors/", json={"name": "Export Author"}).json()
+        items = [{"title": f"Export {i}", "content": "Dumped", "author_id": author["id"]} for i in range(5)]
+        cls.post_ids = client.post("/blog/posts/bulk", json=items).json()["ids"]
+
+    def lines(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    def test_export_resumes_after_id(self):
+        rows = self.lines(client.get("/blog/export/posts", params={"after_id": self.post_ids[1]}))
+        self.assertEqual([row["id"] for row in rows][:3], self.post_ids[2:])
+        self.assertEqual(rows[0], {"id": self.post_ids[2], "title": "Export 2", "content": "Dumped", "author_id": rows[0]["author_id"]})
+
+    def test_export_in_batches(self):
+        batch = export.EXPORT_BATCH
+        export.EXPORT_BATCH = 2
+        try:
+            rows = self.lines(client.get("/blog/export/posts", params={"after_id": self.post_ids[0] - 1}))
+        finally:
+            export.EXPORT_BATCH = batch
+        self.assertEqual([row["id"] for row in rows][:5], self.post_ids)
+
+    def test_export_gzip(self):
+        response = client.get("/blog/export/authors", params={"gzip": True})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        # httpx decompresses transparently
+        self.assertIn("Export Author", [row["name"] for row in self.lines(response)])
+
+    def test_unknown_kind(self):
+        self.assertEqual(client.get("/blog/export/users").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
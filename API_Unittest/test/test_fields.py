@@ -0,0 +1,67 @@
+import unittest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from app.db import db_chooser
+from app.main import app
+from test.helpers import QueryBudgetMixin
+
+client = TestClient(app)
+
+
+class TestFields(QueryBudgetMixin, unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = client.post("/blog/authors/", json={"name": "Fields Author"}).json()
+        cls.post = client.post("/blog/posts/", params={"author_id": author["id"]},
+                               json={"title": "Sparse", "content": "A long body nobody asked for"}).json()
+        client.post(f"/blog/posts/{cls.post['id']}/comments/", json={"content": "Also long"})
+
+    def statements(self, url, params):
+        """The response and every SQL statement the blog read pool ran for it."""
+        statements = []
+        engine = db_chooser.get_engine("blog", readonly=True)
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            response = client.get(url, params=params)
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+        return response, statements
+
+    def test_posts_fields(self):
+        response, statements = self.statements("/blog/posts/", {"fields": "title", "sort": "-id", "limit": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{"id": self.post["id"], "title": "Sparse"}])
+        self.assertTrue(response.headers["etag"])
+        # Neither the body nor the comments were read
+        self.assertFalse([sql for sql in statements if "content" in sql])
+
+    def test_posts_fields_with_comments(self):
+        response = client.get("/blog/posts/", params={"fields": "title,comments", "sort": "-id", "limit": 1})
+        post = response.json()[0]
+        self.assertEqual(set(post), {"id", "title", "comments"})
+        self.assertEqual(post["comments"][0]["content"], "Also long")
+
+    def test_fields_keep_cursor(self):
+        response = client.get("/blog/comments/", params={"fields": "post_id", "sort": "-post_id", "limit": 1})
+        self.assertEqual(set(response.json()[0]), {"id", "post_id"})
+        self.assertIn("x-next-cursor", response.headers)
+        # The sort key was loaded along with the picked fields, no lazy load per row
+        self.assertQueryBudget(response, 1)
+
+    def test_shop_and_task_fields(self):
+        client.post("/task/tasks/1", json={"title": "Fields task", "description": "Unread"})
+        task = client.get("/task/tasks/", params={"fields": "title,completed", "sort": "-id", "limit": 1}).json()[0]
+        self.assertEqual(task, {"id": task["id"], "title": "Fields task", "completed": False})
+        products = client.get("/shop/products_list/", params={"fields": "name,price"}).json()
+        self.assertTrue(all(set(product) == {"id", "name", "price"} for product in products))
+
+    def test_unknown_field(self):
+        self.assertEqual(client.get("/blog/posts/", params={"fields": "version"}).status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
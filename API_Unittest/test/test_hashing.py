@@ -0,0 +1,77 @@
+import inspect
+import unittest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from app.hashing import HashingService, _hash, hasher
+from app.main import app
+from app.Router import auth
+
+client = TestClient(app)
+
+
+class TestHashing(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.service = HashingService(workers=1, queue_per_worker=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.shutdown()
+
+    def test_hash_and_verify(self):
+        hashed = self.service.hash("secret")
+        self.assertTrue(self.service.verify("secret", hashed))
+        self.assertFalse(self.service.verify("wrong", hashed))
+
+    def test_hash_many_keeps_order(self):
+        passwords = [f"many-{i}" for i in range(3)]
+        hashes = self.service.hash_many(passwords)
+        self.assertEqual([self.service.verify(p, h) for p, h in zip(passwords, hashes)], [True] * 3)
+        self.assertFalse(self.service.verify(passwords[0], hashes[1]))
+
+    def test_saturated_pool_rejects(self):
+        future = self.service.submit(_hash, "first")
+        with self.assertRaises(HTTPException) as raised:
+            self.service.submit(_hash, "second")
+        self.assertEqual(raised.exception.status_code, 503)
+        self.assertEqual(raised.exception.headers["Retry-After"], "1")
+        future.result()
+        # The slot is released once the first hash is done
+        self.service.hash("third")
+
+    def test_hash_many_waits_for_a_slot(self):
+        # A login holds the only slot, the batch waits for it instead of failing
+        login = self.service.submit(_hash, "login")
+        hashes = self.service.hash_many(["after-1", "after-2"])
+        self.assertTrue(self.service.verify("after-2", hashes[1]))
+        login.result()
+
+    def test_metrics(self):
+        self.service.hash("counted")
+        lines = self.service.collect()
+        self.assertIn("hash_pool_workers 1", lines)
+        self.assertIn("hash_pool_queue_depth 0", lines)
+        self.assertTrue(any(line.startswith("hash_seconds_count ") and line != "hash_seconds_count 0" for line in lines))
+        self.assertIn("hash_pool_rejected_total", client.get("/metrics").text)
+
+    def test_hashing_routes_hold_no_thread(self):
+        # A thread per login waiting on the pool would drain the threadpool under a burst
+        for endpoint in (auth.login_for_access_token, auth.reg, auth.reg_admin):
+            self.assertTrue(inspect.iscoroutinefunction(endpoint), endpoint.__name__)
+
+    def test_login_returns_503_when_saturated(self):
+        username = f"hash_busy_{id(self)}"
+        client.post("/auth/register_user", json={"username": username, "firstname": "H", "lastname": "B", "passwd": "pw"})
+        capacity = hasher.capacity
+        hasher.capacity = 0
+        try:
+            response = client.post("/auth/login", data={"username": username, "password": "pw"})
+        finally:
+            hasher.capacity = capacity
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["retry-after"], "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import re
+import unittest
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+
+def sample(text, name, db, pool="rw"):
+    match = re.search(rf'^{name}{{db="{db}",pool="{pool}"}} (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_metrics_format(self):
+        response = client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn("# TYPE db_pool_checkouts_total counter", response.text)
+        self.assertIn("# TYPE db_pool_overflow gauge", response.text)
+
+    def test_shop_counters(self):
+        client.post("/shop/category", json={"name": "Metrics"})
+        before = client.get("/metrics").text
+        client.get("/shop/cat_list/")
+        client.post("/shop/category", json={"name": "Metrics Again"})
+        after = client.get("/metrics").text
+
+        self.assertGreater(sample(after, "db_pool_checkouts_total", "shop"), sample(before, "db_pool_checkouts_total", "shop"))
+        self.assertGreater(sample(after, "db_queries_total", "shop", "ro"), sample(before, "db_queries_total", "shop", "ro"))
+        self.assertGreater(sample(after, "db_commits_total", "shop"), sample(before, "db_commits_total", "shop"))
+        self.assertGreaterEqual(sample(after, "db_connections_opened_total", "shop"), 1)
+        self.assertGreaterEqual(sample(after, "db_pool_checkout_wait_seconds_sum", "shop"), 0)
+        self.assertEqual(sample(after, "db_pool_size", "shop"), 10)
+        self.assertEqual(sample(after, "db_pool_overflow", "shop"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
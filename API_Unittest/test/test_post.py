@@ -1,8 +1,11 @@
 import unittest
+import warnings
 from fastapi.testclient import TestClient
+from app.expand import COMMENTS_CURSOR_HEADER, INLINE_COMMENTS_MAX
 from app.main import app
 from app.db import get_db
 from sqlalchemy import create_engine
+from sqlalchemy.exc import SADeprecationWarning
 from sqlalchemy.orm import sessionmaker
 from app import model
 
@@ -49,6 +52,25 @@ class TestPost(unittest.TestCase):
         assert response.status_code == 200
         assert len(response.json()) > 0
     
+    def test_read_authors_expand(self):
+        author_id = client.post("/blog/authors/", json={"name": "Author Expand"}).json()["id"]
+        post_id = client.post("/blog/posts/", json={"title": "Expand", "content": "Expand"}, params={"author_id": author_id}).json()["id"]
+        client.post(f"/blog/posts/{post_id}/comments/", json={"content": "Expanded"})
+        params = {"sort": "-id", "limit": 1}
+
+        # Unexpanded relationships are filled in, not loaded with the deprecated noload
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", SADeprecationWarning)
+            author = client.get("/blog/authors/", params=params).json()[0]
+            assert author["posts"][0]["comments"][0]["content"] == "Expanded"
+            author = client.get("/blog/authors/", params={**params, "expand": "posts"}).json()[0]
+            assert author["posts"][0]["id"] == post_id
+            assert author["posts"][0]["comments"] == []
+            author = client.get("/blog/authors/", params={**params, "expand": ""}).json()[0]
+            assert author["posts"] == []
+            assert client.get(f"/blog/posts/{post_id}", params={"expand": ""}).json()["comments"] == []
+        assert client.get("/blog/authors/", params={"expand": "comments"}).status_code == 400
+
     def test_create_post(self):
         # Create an author first
         author_response = client.post("/blog/authors/", json={"name": "Author Name3"})
@@ -65,6 +87,32 @@ class TestPost(unittest.TestCase):
         assert response.status_code == 200
         assert len(response.json()) > 0
 
+    def test_read_post_summaries(self):
+        post_id = client.post("/blog/posts/", json={"title": "Summary", "content": "Summary"}, params={"author_id": 1}).json()["id"]
+        comment_ids = [client.post(f"/blog/posts/{post_id}/comments/", json={"content": "Counted"}).json()["id"] for _ in range(2)]
+
+        response = client.get("/blog/posts/summary", params={"sort": "-id", "limit": 1})
+        assert response.status_code == 200
+        assert response.json() == [{"id": post_id, "title": "Summary", "author_id": 1, "comment_count": 2, "last_comment_id": comment_ids[-1]}]
+
+    def test_read_post_comments(self):
+        post_id = client.post("/blog/posts/", json={"title": "Viral", "content": "Viral"}, params={"author_id": 1}).json()["id"]
+        items = [{"content": f"Comment {i}", "post_id": post_id} for i in range(INLINE_COMMENTS_MAX + 5)]
+        comment_ids = client.post("/blog/comments/bulk", json=items).json()["ids"]
+
+        # read_post embeds the first INLINE_COMMENTS_MAX and points at the rest
+        response = client.get(f"/blog/posts/{post_id}")
+        assert [c["id"] for c in response.json()["comments"]] == comment_ids[:INLINE_COMMENTS_MAX]
+        cursor = response.headers[COMMENTS_CURSOR_HEADER]
+        response = client.get(f"/blog/posts/{post_id}/comments", params={"cursor": cursor})
+        assert [c["id"] for c in response.json()] == comment_ids[INLINE_COMMENTS_MAX:]
+        assert "x-next-cursor" not in response.headers
+
+        response = client.get(f"/blog/posts/{post_id}/comments", params={"limit": 3, "sort": "-id"})
+        assert [c["id"] for c in response.json()] == comment_ids[::-1][:3]
+        assert "x-next-cursor" in response.headers
+        assert client.get("/blog/posts/999999/comments").status_code == 404
+
     def test_read_post(self):
         # Create a post first
         post_response = client.post("/blog/posts/", json={"title": "Post Title", "content": "Post Content"}, params={"author_id": 1})
@@ -0,0 +1,49 @@
+import unittest
+from fastapi.testclient import TestClient
+from app.main import app
+from test.helpers import QueryBudgetMixin
+
+client = TestClient(app)
+
+
+class TestQueryBudget(QueryBudgetMixin, unittest.TestCase):
+
+    def test_headers(self):
+        response = client.get("/task/tasks/")
+        self.assertIn("x-db-query-count", response.headers)
+        self.assertTrue(response.headers["server-timing"].startswith("db;dur="))
+        self.assertEqual(client.get("/lib/all_books/").headers["x-db-query-count"], "0")
+
+    def test_list_routes(self):
+        client.post("/task/tasks/1", json={"title": "Budget", "description": "Budget"})
+        client.post("/shop/category", json={"name": "Budget"})
+        self.assertQueryBudget(client.get("/task/tasks/"), 1)
+        self.assertQueryBudget(client.get("/shop/cat_list/"), 1)
+        self.assertQueryBudget(client.get("/shop/products_list/"), 1)
+        self.assertQueryBudget(client.get("/auth/users"), 1)
+
+    def test_blog_nested_reads(self):
+        for i in range(3):
+            author_id = client.post("/blog/authors/", json={"name": f"Budget Author {i}"}).json()["id"]
+            for _ in range(2):
+                post_id = client.post("/blog/posts/", json={"title": "Budget", "content": "Budget"}, params={"author_id": author_id}).json()["id"]
+                client.post(f"/blog/posts/{post_id}/comments/", json={"content": "Budget"})
+
+        # One query per nesting level, whatever the page size
+        self.assertQueryBudget(client.get("/blog/authors/", params={"limit": 50}), 3)
+        self.assertQueryBudget(client.get("/blog/authors/", params={"limit": 50, "expand": "posts"}), 2)
+        self.assertQueryBudget(client.get("/blog/authors/", params={"limit": 50, "expand": ""}), 1)
+        # Post reads also look up the ETag version first
+        self.assertQueryBudget(client.get("/blog/posts/", params={"limit": 50}), 3)
+        self.assertQueryBudget(client.get(f"/blog/posts/{post_id}"), 3)
+        self.assertQueryBudget(client.get("/blog/posts/summary", params={"limit": 50}), 2)
+
+    def test_write_routes(self):
+        response = client.post("/task/tasks/1", json={"title": "Budget", "description": "Budget"})
+        # INSERT plus the refresh SELECT
+        self.assertQueryBudget(response, 2)
+        self.assertQueryBudget(client.put(f"/task/tasks/{response.json()['id']}", json={"title": "Done"}), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+import uuid
+from unittest import mock
+from fastapi import HTTPException, Request
+from fastapi.testclient import TestClient
+from app import ratelimit
+from app.hashing import hasher
+from app.main import app
+from app.ratelimit import AuthLimiter, MemoryBackend, SQLiteBackend, take_token
+
+client = TestClient(app)
+
+
+def hash_count():
+    return next(line for line in hasher.collect() if line.startswith("hash_seconds_count "))
+
+
+class TestRateLimit(unittest.TestCase):
+
+    def test_take_token_refills(self):
+        wait, state = take_token(None, 2, 1.0, 100.0)
+        self.assertEqual((wait, state), (0, (1.0, 100.0)))
+        wait, state = take_token(state, 2, 1.0, 100.0)
+        wait, state = take_token(state, 2, 1.0, 100.0)
+        self.assertEqual(wait, 1.0)
+        # Half a second later half a token is back
+        wait, state = take_token(state, 2, 1.0, 100.5)
+        self.assertEqual(wait, 0.5)
+        wait, state = take_token(state, 2, 1.0, 101.0)
+        self.assertEqual(wait, 0)
+
+    def test_memory_backend_is_bounded(self):
+        backend = MemoryBackend(maxsize=2)
+        for key in ("a", "b", "c"):
+            self.assertEqual(backend.take(key, 1, 0.1), 0)
+        self.assertEqual(len(backend.buckets), 2)
+        self.assertGreater(backend.take("c", 1, 0.1), 0)
+
+    def test_sqlite_backend_is_shared(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ratelimit.db")
+            first, second = SQLiteBackend(path), SQLiteBackend(path)
+            self.assertEqual(first.take("shared", 1, 0.1), 0)
+            self.assertGreater(second.take("shared", 1, 0.1), 0)
+            self.assertEqual(second.take("other", 1, 0.1), 0)
+            first._local.conn.close()
+            second._local.conn.close()
+
+    def test_ip_bucket(self):
+        limiter = AuthLimiter(MemoryBackend())
+        request = Request({"type": "http", "client": ("10.0.0.1", 1234), "headers": []})
+        with mock.patch.object(ratelimit, "RATE_LIMIT_IP_BURST", 1):
+            limiter.check(request)
+            with self.assertRaises(HTTPException) as raised:
+                limiter.check(request, "someone")
+        self.assertEqual(raised.exception.status_code, 429)
+        self.assertIn('auth_rate_limited_total{bucket="ip"} 1', limiter.collect())
+
+    def test_check_async_keeps_sqlite_off_the_loop(self):
+        request = Request({"type": "http", "client": ("10.0.0.2", 1234), "headers": []})
+        with tempfile.TemporaryDirectory() as directory:
+            limiter = AuthLimiter(SQLiteBackend(os.path.join(directory, "ratelimit.db")))
+            threads = []
+            take = limiter.backend.take
+            with mock.patch.object(limiter.backend, "take", lambda *args: threads.append(threading.get_ident()) or take(*args)):
+                asyncio.run(limiter.check_async(request, "someone"))
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    def test_login_throttled_before_hashing(self):
+        username = f"Limit_{uuid.uuid4().hex[:8]}"
+        with mock.patch.object(ratelimit, "RATE_LIMIT_USER_BURST", 2):
+            client.post("/auth/register_user", json={"username": username, "firstname": "R", "lastname": "L", "passwd": "right"})
+            self.assertEqual(client.post("/auth/login", data={"username": username, "password": "wrong"}).status_code, 401)
+            before = hash_count()
+            # Same bucket whatever the case
+            response = client.post("/auth/login", data={"username": username.lower(), "password": "right"})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers["retry-after"]), 1)
+        self.assertEqual(hash_count(), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import uuid
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.pool import StaticPool
+from app import model
+from app.db import db_chooser
+from app.main import app
+from app.roles import role_cache
+from app.schema import init_db
+from test.helpers import QueryBudgetMixin
+
+client = TestClient(app)
+
+
+class TestRoleCache(QueryBudgetMixin, unittest.TestCase):
+
+    def register(self, route="/auth/register_user"):
+        username = f"role_{uuid.uuid4().hex[:8]}"
+        response = client.post(route, json={"username": username, "firstname": "Role", "lastname": "User", "passwd": "rolepassword"})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def roles_of(self, user_id):
+        with db_chooser.get_session_local("auth", readonly=True)() as db:
+            return db.scalars(
+                select(model.Roles.name).join(model.user_roles).where(model.user_roles.c.user_id == user_id)
+            ).all()
+
+    def test_registration_commits_once(self):
+        self.register()
+        commits = []
+        engine = db_chooser.get_engine("auth")
+        listener = lambda conn: commits.append(conn)
+        event.listen(engine, "commit", listener)
+        try:
+            response = self.register()
+        finally:
+            event.remove(engine, "commit", listener)
+        self.assertEqual(len(commits), 1)
+        # Username check, user insert, user_roles insert; the role id is cached
+        self.assertQueryBudget(response, 3)
+        self.assertEqual(self.roles_of(response.json()["id"]), ["user"])
+
+    def test_admin_role(self):
+        response = self.register("/auth/register_admin")
+        self.assertEqual(self.roles_of(response.json()["id"]), ["admin"])
+        with db_chooser.get_session_local("auth")() as db:
+            self.assertIsNotNone(role_cache.get(db, "admin"))
+
+    def test_role_cached_on_commit_only(self):
+        name = f"role_{uuid.uuid4().hex[:8]}"
+        with db_chooser.get_session_local("auth")() as db:
+            role_cache.role_id(db, name)
+            db.rollback()
+            self.assertIsNone(role_cache.get(db, name))
+            role_id = role_cache.role_id(db, name)
+            db.commit()
+            self.assertEqual(role_cache.get(db, name), role_id)
+
+    def test_warm_loads_existing_roles(self):
+        self.register()
+        role_cache.clear()
+        role_cache.warm()
+        with db_chooser.get_session_local("auth")() as db:
+            self.assertIsNotNone(role_cache.get(db, "user"))
+
+    def test_in_memory_databases(self):
+        try:
+            for _ in range(2):
+                # A fresh database each time, its role ids must not come from the last one
+                engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+                init_db("auth", engine)
+                db_chooser.set_engine("auth", engine)
+                response = self.register()
+                self.assertEqual(self.roles_of(response.json()["id"]), ["user"])
+        finally:
+            # The file engines are created again on next use
+            db_chooser.dispose("auth")
+
+
+if __name__ == "__main__":
+    unittest.main()
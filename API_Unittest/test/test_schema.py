@@ -0,0 +1,110 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine, inspect, text
+from app import model
+from app.db import db_chooser
+from app.manage import main as manage
+from app.schema import add_missing_columns, create_missing_indexes, index_collisions, init_db, missing_indexes
+
+
+class TestSchema(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def test_tables_are_partitioned(self):
+        self.assertEqual({t.name for t in model.tables_for("auth")}, {"users", "roles", "user_roles", "api_keys"})
+        self.assertEqual({t.name for t in model.tables_for("blog")}, {"authors", "posts", "comments", "collection_versions"})
+        self.assertEqual({t.name for t in model.tables_for("task")}, {"tasks"})
+        self.assertEqual({t.name for t in model.tables_for("shop")}, {"categories", "products", "customers", "orders"})
+
+    def test_init_db_creates_only_its_tables(self):
+        created = init_db("blog", self.engine)
+        self.assertEqual(set(created), {"authors", "posts", "comments", "collection_versions"})
+        # Plus the full-text index (posts_fts, comments_fts and their shadow tables)
+        names = set(inspect(self.engine).get_table_names())
+        self.assertEqual({name for name in names if "_fts" not in name}, {"authors", "posts", "comments", "collection_versions"})
+        self.assertTrue({"posts_fts", "comments_fts"} <= names)
+
+    def test_init_db_skips_existing_tables(self):
+        init_db("shop", self.engine)
+        self.assertEqual(init_db("shop", self.engine), [])
+
+    def test_foreign_keys_are_indexed(self):
+        init_db("shop", self.engine)
+        names = {index["name"] for index in inspect(self.engine).get_indexes("orders")}
+        self.assertEqual(names, {"ix_orders_product_id", "ix_orders_customer_id"})
+        self.assertEqual(missing_indexes("shop", self.engine), [])
+
+    def test_create_missing_indexes(self):
+        init_db("task", self.engine)
+        with self.engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_tasks_owner_id_completed"))
+            conn.execute(text("INSERT INTO tasks (title, owner_id, completed) VALUES ('kept', 1, 0)"))
+
+        self.assertEqual([index.name for index in missing_indexes("task", self.engine)], ["ix_tasks_owner_id_completed"])
+        self.assertEqual(create_missing_indexes("task", self.engine), ["ix_tasks_owner_id_completed"])
+        self.assertEqual(create_missing_indexes("task", self.engine), [])
+        with self.engine.connect() as conn:
+            plan = conn.execute(text("EXPLAIN QUERY PLAN SELECT * FROM tasks WHERE owner_id = 1 AND completed = 0")).all()
+            self.assertIn("ix_tasks_owner_id_completed", plan[0][-1])
+            self.assertEqual(conn.execute(text("SELECT title FROM tasks")).scalar(), "kept")
+
+    def test_unique_index_replaces_legacy_one(self):
+        init_db("auth", self.engine)
+        # An auth.db from when the index was not unique, holding a case collision
+        with self.engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_users_username_lower"))
+            conn.execute(text("CREATE INDEX ix_users_username_lower ON users (username_lower)"))
+            conn.execute(text("INSERT INTO users (username, username_lower) VALUES ('Alice', 'alice'), ('alice', 'alice')"))
+
+        [index] = missing_indexes("auth", self.engine)
+        self.assertEqual(index_collisions(index, self.engine), [("alice", 2)])
+        self.assertEqual(create_missing_indexes("auth", self.engine), [])
+
+        with self.engine.begin() as conn:
+            conn.execute(text("DELETE FROM users WHERE username = 'alice'"))
+        self.assertEqual(create_missing_indexes("auth", self.engine), ["ix_users_username_lower"])
+        unique = {index["name"]: index["unique"] for index in inspect(self.engine).get_indexes("users")}
+        self.assertTrue(unique["ix_users_username_lower"])
+        self.assertEqual(missing_indexes("auth", self.engine), [])
+
+    def test_indexes_command_shows_new_plan(self):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(f"sqlite:///{os.path.join(directory, 'task.db')}")
+            init_db("task", engine)
+            with engine.begin() as conn:
+                conn.execute(text("DROP INDEX ix_tasks_owner_id_completed"))
+            db_chooser.set_engine("task", engine)
+            try:
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    manage(["indexes", "task"])
+            finally:
+                db_chooser.dispose("task")
+        # The pooled connections saw the old schema, the after plans must not
+        self.assertNotIn("after:  SCAN", output.getvalue())
+        self.assertEqual(output.getvalue().count("after:  SEARCH tasks USING INDEX ix_tasks_owner_id_completed"), 2)
+
+    def test_add_missing_columns(self):
+        # A blog.db from before posts.version existed
+        with self.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE posts (id INTEGER PRIMARY KEY, title VARCHAR, content TEXT, author_id INTEGER)"))
+            conn.execute(text("INSERT INTO posts (title, content, author_id) VALUES ('old', 'post', 1)"))
+
+        init_db("blog", self.engine)
+        self.assertEqual(add_missing_columns("blog", self.engine), [])
+        with self.engine.begin() as conn:
+            self.assertEqual(conn.execute(text("SELECT version FROM posts")).scalar(), 1)
+            conn.execute(text("UPDATE posts SET title = 'edited'"))
+            self.assertEqual(conn.execute(text("SELECT version FROM posts")).scalar(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
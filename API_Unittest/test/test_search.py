@@ -0,0 +1,75 @@
+import unittest
+import uuid
+from fastapi.testclient import TestClient
+from app.main import app
+from app.pagination import encode_cursor
+
+client = TestClient(app)
+
+
+class TestSearch(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # A word no other test writes, so hits only come from these posts
+        cls.word = f"zq{uuid.uuid4().hex[:10]}"
+        author = client.post("/blog/authors/", json={"name": "Search Author"}).json()
+        cls.post_ids = []
+        for i in range(5):
+            # Title hits are weighted above body hits, the last post has the word in its title
+            title = f"{cls.word} in the title" if i == 4 else f"Search post {i}"
+            post = client.post("/blog/posts/", params={"author_id": author["id"]},
+                               json={"title": title, "content": f"Body text about {cls.word} number {i}"}).json()
+            cls.post_ids.append(post["id"])
+        cls.comment = client.post(f"/blog/posts/{cls.post_ids[0]}/comments/",
+                                  json={"content": f"A comment mentioning {cls.word}"}).json()
+
+    def search(self, **params):
+        response = client.get("/blog/posts/search", params={"q": self.word, **params})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_search_posts_ranked(self):
+        hits = self.search().json()
+        self.assertEqual(sorted(hit["post_id"] for hit in hits), sorted(self.post_ids))
+        self.assertEqual(hits[0]["post_id"], self.post_ids[4])
+        self.assertEqual([hit["rank"] for hit in hits], sorted(hit["rank"] for hit in hits))
+        self.assertIn(f"[{self.word}]", hits[0]["snippet"])
+
+    def test_search_cursor(self):
+        ids, cursor = [], None
+        while True:
+            response = self.search(limit=2, **({"cursor": cursor} if cursor else {}))
+            ids.extend(hit["post_id"] for hit in response.json())
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                break
+        self.assertEqual(sorted(ids), sorted(self.post_ids))
+        self.assertEqual(ids, [hit["post_id"] for hit in self.search().json()])
+
+    def test_search_comments(self):
+        hits = self.search(scope="comments").json()
+        self.assertEqual([(hit["post_id"], hit["comment_id"]) for hit in hits],
+                         [(self.post_ids[0], self.comment["id"])])
+
+    def test_index_follows_updates(self):
+        post_id = self.post_ids[3]
+        client.put(f"/blog/posts/{post_id}", json={"title": "Renamed", "content": "Nothing to find here"})
+        self.assertNotIn(post_id, [hit["post_id"] for hit in self.search().json()])
+        client.put(f"/blog/posts/{post_id}", json={"title": "Search post 3", "content": f"Back to {self.word}"})
+        self.assertIn(post_id, [hit["post_id"] for hit in self.search().json()])
+
+    def test_search_errors(self):
+        self.assertEqual(client.get("/blog/posts/search", params={"q": " "}).status_code, 400)
+        self.assertEqual(client.get("/blog/posts/search", params={"q": "x", "scope": "authors"}).status_code, 400)
+        self.assertEqual(client.get("/blog/posts/search", params={"q": "x", "cursor": "bogus"}).status_code, 400)
+        # Forged keys that are not [rank, id]
+        for keys in ([{}, "y"], ["y", "z"], [-1.5, "7"], [True, 1], [-1.5]):
+            cursor = encode_cursor({"k": keys, "d": "next", "s": "search:posts"})
+            self.assertEqual(client.get("/blog/posts/search", params={"q": "x", "cursor": cursor}).status_code, 400)
+        # FTS5 syntax in the query is searched for literally
+        self.assertEqual(client.get("/blog/posts/search", params={"q": '"unbalanced AND'}).status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import json
+import os
+import tempfile
+import unittest
+import uuid
+from unittest import mock
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from app import model
+from app.Router import auth
+from app.db import db_chooser
+from app.main import app
+from app.manage import main as manage
+from app.user_import import UserImport
+
+client = TestClient(app)
+
+
+def register(route):
+    username = f"imp_{uuid.uuid4().hex[:8]}"
+    client.post(route, json={"username": username, "firstname": "Imp", "lastname": "Admin", "passwd": "importpass"})
+    token = client.post("/auth/login", data={"username": username, "password": "importpass"}).json()["access_token"]
+    return username, {"Authorization": f"Bearer {token}"}
+
+
+def user_row(username):
+    return {"username": username, "firstname": "Bulk", "lastname": "User", "passwd": f"pw-{username}"}
+
+
+class TestUserImport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.admin, cls.headers = register("/auth/register_admin")
+
+    def roles_of(self, username):
+        with db_chooser.get_session_local("auth", readonly=True)() as db:
+            return db.scalars(
+                select(model.Roles.name).join(model.user_roles).join(model.User).where(model.User.username == username)
+            ).all()
+
+    def test_requires_admin(self):
+        self.assertEqual(client.post("/auth/users/import", content=b"").status_code, 401)
+        _, headers = register("/auth/register_user")
+        self.assertEqual(client.post("/auth/users/import", content=b"", headers=headers).status_code, 403)
+
+    def test_ndjson_import_reports_failures(self):
+        prefix = uuid.uuid4().hex[:6]
+        good = [f"{prefix}_a", f"{prefix}_b"]
+        body = "\n".join([
+            json.dumps(user_row(good[0])),
+            json.dumps(user_row(self.admin)),
+            "{not json",
+            json.dumps({"username": f"{prefix}_c", "firstname": "No", "lastname": "Password"}),
+            json.dumps(user_row(good[0])),
+            "",
+            json.dumps(user_row(good[1])),
+        ])
+        response = client.post("/auth/users/import", content=body.encode(), headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual((report["rows"], report["created"], report["failed"]), (6, 2, 4))
+        self.assertEqual(
+            [(error["line"], error["username"]) for error in report["errors"]],
+            [(2, self.admin), (3, None), (4, f"{prefix}_c"), (5, good[0])],
+        )
+        self.assertIn("Username exists", report["errors"][0]["error"])
+        self.assertIn("passwd", report["errors"][2]["error"])
+        self.assertGreater(report["rows_per_sec"], 0)
+        # Imported users have the role and a working password
+        self.assertEqual(self.roles_of(good[1]), ["user"])
+        response = client.post("/auth/login", data={"username": good[1], "password": f"pw-{good[1]}"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_csv_batches(self):
+        prefix = uuid.uuid4().hex[:6]
+        names = [f"{prefix}_{i}" for i in range(5)]
+        lines = ["passwd,username,firstname,lastname"] + [f"pw,{name},Csv,User" for name in names] + ["pw,short"]
+        importer = UserImport("csv", "editor")
+        for start in range(0, len(lines), 2):
+            importer.feed(lines[start:start + 2])
+        report = importer.report()
+        self.assertEqual((report["rows"], report["created"], report["failed"]), (6, 5, 1))
+        self.assertEqual(report["errors"][0]["line"], 7)
+        self.assertEqual(self.roles_of(names[-1]), ["editor"])
+
+    def test_bad_format_and_header(self):
+        response = client.post("/auth/users/import", params={"format": "xml"}, content=b"", headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        response = client.post("/auth/users/import", params={"format": "csv"}, content=b"username,passwd\n", headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_row_and_size_caps(self):
+        prefix = uuid.uuid4().hex[:6]
+        names = [f"{prefix}_{i}" for i in range(3)]
+        body = "\n".join(json.dumps(user_row(name)) for name in names).encode()
+        with mock.patch.object(auth, "IMPORT_MAX_ROWS", 2):
+            response = client.post("/auth/users/import", content=body, headers=self.headers)
+        self.assertEqual(response.status_code, 413)
+        # The rows under the cap went in, the report says where it stopped
+        report = response.json()
+        self.assertEqual((report["rows"], report["created"]), (2, 2))
+        self.assertIn("2 rows", report["aborted"])
+        self.assertEqual(self.roles_of(names[1]), ["user"])
+        self.assertEqual(self.roles_of(names[2]), [])
+
+        with mock.patch.object(auth, "IMPORT_MAX_BYTES", 10):
+            response = client.post("/auth/users/import", content=body, headers=self.headers)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.json()["created"], 0)
+
+    def test_manage_command(self):
+        username = f"imp_cli_{uuid.uuid4().hex[:6]}"
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson", delete=False) as f:
+            f.write(json.dumps(user_row(username)) + "\n")
+        try:
+            manage(["import-users", f.name])
+        finally:
+            os.remove(f.name)
+        self.assertEqual(self.roles_of(username), ["user"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import uuid
+from unittest import mock
+from fastapi.testclient import TestClient
+from sqlalchemy import select, text
+from sqlalchemy.exc import IntegrityError
+from app import model
+from app.Router import auth
+from app.db import db_chooser
+from app.main import app
+from app.schema import init_db
+from app.users import prefix_filter
+from test.helpers import QueryBudgetMixin
+
+client = TestClient(app)
+
+
+def register(username):
+    return client.post("/auth/register_user", json={"username": username, "firstname": "Case", "lastname": "User", "passwd": "casepassword"})
+
+
+class TestUserSearch(QueryBudgetMixin, unittest.TestCase):
+
+    def test_read_user_by_name_ignores_case(self):
+        username = f"CaseUser_{uuid.uuid4().hex[:8]}"
+        self.assertEqual(register(username).status_code, 200)
+        response = client.get(f"/auth/users_n/{username.lower()}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["username"], username)
+        # Another case of a taken name is taken too
+        self.assertEqual(register(username.upper()).status_code, 400)
+
+    def test_case_collision_refused_by_index(self):
+        username = f"Race_{uuid.uuid4().hex[:8]}"
+        self.assertEqual(register(username).status_code, 200)
+        # A registration that passed the check before the other one committed
+        with mock.patch.object(auth, "username_taken", return_value=False):
+            self.assertEqual(register(username.lower()).status_code, 400)
+        with self.assertRaises(IntegrityError), db_chooser.get_engine("auth").begin() as conn:
+            conn.execute(text("INSERT INTO users (username, username_lower) VALUES (:username, :lower)"), {"username": username.upper(), "lower": username.lower()})
+
+    def test_prefix_search(self):
+        prefix = f"pick{uuid.uuid4().hex[:6]}"
+        names = [f"{prefix}_Carol", f"{prefix}_alice", f"{prefix}_Bob"]
+        for name in names:
+            register(name)
+        register(f"x{prefix}_outside")
+
+        response = client.get("/auth/users/search", params={"prefix": prefix.upper()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user["username"] for user in response.json()], [names[1], names[2], names[0]])
+        self.assertQueryBudget(response, 1)
+
+        response = client.get("/auth/users/search", params={"prefix": f"{prefix}_b", "limit": 1})
+        self.assertEqual([user["username"] for user in response.json()], [names[2]])
+        self.assertEqual(client.get("/auth/users/search", params={"prefix": f"{prefix}_z"}).json(), [])
+        self.assertEqual(client.get("/auth/users/search", params={"prefix": ""}).status_code, 422)
+        self.assertEqual(client.get("/auth/users/search", params={"prefix": "a", "limit": 500}).status_code, 422)
+
+    def test_prefix_search_uses_index(self):
+        statement = select(model.User).where(prefix_filter(model.User.username_lower, "pick")).order_by(model.User.username_lower).limit(10)
+        engine = db_chooser.get_engine("auth")
+        sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+        with engine.connect() as conn:
+            plan = " ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+        self.assertIn("ix_users_username_lower (username_lower>? AND username_lower<?)", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_backfill(self):
+        username = f"Raw_{uuid.uuid4().hex[:8]}"
+        engine = db_chooser.get_engine("auth")
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO users (username, active) VALUES (:username, 1)"), {"username": username})
+        init_db("auth", engine)
+        with engine.connect() as conn:
+            lower = conn.execute(text("SELECT username_lower FROM users WHERE username = :username"), {"username": username}).scalar()
+        self.assertEqual(lower, username.lower())
+
+
+if __name__ == "__main__":
+    unittest.main()